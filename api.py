@@ -0,0 +1,194 @@
+import json
+import os
+from urllib.parse import parse_qs
+from wsgiref.simple_server import make_server
+import pandas as pd
+from utils import (
+    load_data, get_shard_paths, list_shards, validate_service_data,
+    add_services_batch, apply_km_updates, score_service_costs,
+    lookup_vehicles_batch, read_plate_services, build_plate_index
+)
+
+# API JSON lokal untuk tablet scanner di gerbang bengkel.
+# Jalankan: python api.py  (waitress dipakai jika terpasang: multi-thread & keep-alive)
+API_HOST = os.environ.get('SERVIS_API_HOST', '127.0.0.1')
+API_PORT = int(os.environ.get('SERVIS_API_PORT', '8502'))
+API_THREADS = 4
+MAX_BATCH = 500
+
+# Nilai default field servis, sama seperti form Tambah Servis di app.py
+SERVICE_DEFAULTS = {
+    'plat_nomor': '', 'tanggal': '', 'km_saat_servis': 0, 'jenis_servis': '',
+    'bengkel': '', 'biaya': 0, 'teknisi': '', 'keterangan': ''
+}
+
+# ===== HELPER RESPONSE =====
+def _json_response(start_response, status, payload):
+    body = json.dumps(payload, ensure_ascii=False, default=str).encode('utf-8')
+    start_response(status, [
+        ('Content-Type', 'application/json; charset=utf-8'),
+        ('Content-Length', str(len(body)))
+    ])
+    return [body]
+
+def _read_json_body(environ):
+    length = int(environ.get('CONTENT_LENGTH') or 0)
+    if length <= 0:
+        return {}
+    return json.loads(environ['wsgi.input'].read(length).decode('utf-8'))
+
+def _resolve_paths(cabang):
+    # Hanya cabang yang sudah ada (tidak membuat folder baru dari request)
+    if cabang and cabang not in list_shards():
+        return None
+    return get_shard_paths(cabang or None)
+
+# ===== ENDPOINT: CARI KENDARAAN (BATCH) =====
+def handle_lookup(params):
+    """
+    Mengambil kendaraan + ringkasan + servis terakhir untuk banyak plat
+    Parameter: params (dict) {'plat_nomor': [...], 'jumlah_servis': 5, 'cabang': None}
+    Return: Tuple (status HTTP, payload dict)
+    """
+    plates = params.get('plat_nomor') or []
+    if isinstance(plates, str):
+        plates = [plates]
+    if not plates:
+        return '400 Bad Request', {'error': 'plat_nomor wajib diisi'}
+    if len(plates) > MAX_BATCH:
+        return '400 Bad Request', {'error': f'Maksimal {MAX_BATCH} plat per request'}
+
+    paths = _resolve_paths(params.get('cabang'))
+    if paths is None:
+        return '404 Not Found', {'error': 'Cabang tidak ditemukan'}
+    vehicle_file, service_file = paths
+
+    n_services = int(params.get('jumlah_servis', 5))
+    return '200 OK', {'hasil': lookup_vehicles_batch(vehicle_file, service_file, plates, n_services)}
+
+# ===== ENDPOINT: SIMPAN SERVIS (BATCH) =====
+def handle_insert(params):
+    """
+    Menyimpan banyak catatan servis dalam satu kali tulis; record yang tidak
+    valid dilewati dan dilaporkan per index
+    Parameter: params (dict) {'servis': [dict, ...], 'cabang': None}
+    Return: Tuple (status HTTP, payload dict)
+    """
+    records = params.get('servis') or []
+    if not isinstance(records, list) or not records:
+        return '400 Bad Request', {'error': 'servis wajib berupa list dan tidak kosong'}
+    if len(records) > MAX_BATCH:
+        return '400 Bad Request', {'error': f'Maksimal {MAX_BATCH} servis per request'}
+
+    paths = _resolve_paths(params.get('cabang'))
+    if paths is None:
+        return '404 Not Found', {'error': 'Cabang tidak ditemukan'}
+    vehicle_file, service_file = paths
+
+    df_vehicles = load_data(vehicle_file)
+    known_plates = set(df_vehicles['plat_nomor'].astype(str)) if not df_vehicles.empty else set()
+
+    hasil = [None] * len(records)
+    valid_index = []
+    valid_records = []
+    for i, record in enumerate(records):
+        if not isinstance(record, dict):
+            hasil[i] = {'index': i, 'status': 'gagal', 'pesan': 'Format servis tidak valid'}
+            continue
+        # Field wajib tetap divalidasi dari record asli; field opsional diisi default form
+        is_valid, message = validate_service_data(record)
+        if is_valid and str(record['plat_nomor']) not in known_plates:
+            is_valid, message = False, f"Kendaraan {record['plat_nomor']} tidak terdaftar"
+        if not is_valid:
+            hasil[i] = {'index': i, 'status': 'gagal', 'pesan': message}
+            continue
+        service_data = {
+            key: default if record.get(key) is None else record[key]
+            for key, default in SERVICE_DEFAULTS.items()
+        }
+        # Tanggal wajib ISO (form memakai date_input); disimpan dalam bentuk YYYY-MM-DD
+        try:
+            service_data['tanggal'] = pd.to_datetime(str(service_data['tanggal']), format='ISO8601').strftime('%Y-%m-%d')
+        except (ValueError, TypeError):
+            hasil[i] = {'index': i, 'status': 'gagal', 'pesan': f"Format tanggal tidak valid: {service_data['tanggal']} (pakai YYYY-MM-DD)"}
+            continue
+        valid_index.append(i)
+        valid_records.append(service_data)
+
+    if valid_records:
+        success, service_ids = add_services_batch(service_file, valid_records)
+        if not success:
+            return '500 Internal Server Error', {'error': 'Gagal menyimpan servis'}
+
+        # KM terakhir kendaraan ikut diperbarui (maksimum per plat)
+        apply_km_updates(vehicle_file, pd.Series(
+            [record['km_saat_servis'] for record in valid_records],
+            index=[record['plat_nomor'] for record in valid_records]
+        ))
+
+        # Skor biaya semua servis sekaligus terhadap baseline yang di-cache
+        anomalies = score_service_costs(vehicle_file, service_file, valid_records)
+        for i, service_id, anomaly in zip(valid_index, service_ids, anomalies):
+            hasil[i] = {'index': i, 'status': 'ok', 'id_servis': service_id}
+            if anomaly and anomaly['anomali']:
+                hasil[i]['peringatan'] = {'biaya_tidak_wajar': anomaly}
+
+    return '200 OK', {'berhasil': len(valid_records), 'gagal': len(records) - len(valid_records), 'hasil': hasil}
+
+# ===== ROUTING WSGI =====
+def application(environ, start_response):
+    method = environ.get('REQUEST_METHOD', 'GET')
+    path = environ.get('PATH_INFO', '/').rstrip('/')
+    try:
+        if path == '/api/status':
+            return _json_response(start_response, '200 OK', {'status': 'ok'})
+
+        if path == '/api/kendaraan' and method == 'GET':
+            # GET /api/kendaraan?plat=B 1234 XYZ&plat=...&cabang=...
+            query = parse_qs(environ.get('QUERY_STRING', ''))
+            params = {
+                'plat_nomor': query.get('plat', []),
+                'jumlah_servis': query.get('jumlah_servis', ['5'])[0],
+                'cabang': query.get('cabang', [None])[0]
+            }
+            status, payload = handle_lookup(params)
+        elif path == '/api/kendaraan/cari' and method == 'POST':
+            status, payload = handle_lookup(_read_json_body(environ))
+        elif path == '/api/servis/batch' and method == 'POST':
+            status, payload = handle_insert(_read_json_body(environ))
+        else:
+            status, payload = '404 Not Found', {'error': f'Endpoint {method} {path} tidak ada'}
+        return _json_response(start_response, status, payload)
+    except (ValueError, TypeError) as e:
+        return _json_response(start_response, '400 Bad Request', {'error': str(e)})
+    except Exception as e:
+        print(f"Error API: {e}")
+        return _json_response(start_response, '500 Internal Server Error', {'error': str(e)})
+
+# ===== MENJALANKAN SERVER =====
+def warm_caches():
+    # Bangun indeks plat & offset servis sekali di awal agar scan pertama tetap cepat
+    for cabang in [None] + list_shards():
+        vehicle_file, service_file = get_shard_paths(cabang)
+        load_data(vehicle_file)
+        build_plate_index(vehicle_file)
+        if os.path.exists(service_file):
+            read_plate_services(service_file, [])
+
+def run_server(host=API_HOST, port=API_PORT):
+    warm_caches()
+    try:
+        from waitress import serve
+    except ImportError:
+        serve = None
+
+    if serve is not None:
+        print(f"API servis berjalan di http://{host}:{port} (waitress, {API_THREADS} thread)")
+        serve(application, host=host, port=port, threads=API_THREADS)
+    else:
+        print(f"API servis berjalan di http://{host}:{port} (wsgiref, tanpa keep-alive; pasang waitress untuk keep-alive)")
+        with make_server(host, port, application) as server:
+            server.serve_forever()
+
+if __name__ == '__main__':
+    run_server()
@@ -2,13 +2,23 @@ import streamlit as st
 import pandas as pd
 from datetime import datetime
 import os
+import json
+import time
 from utils import (
-    load_data, save_data, add_vehicle, update_vehicle, 
+    load_data, add_vehicle, update_vehicle, 
     delete_vehicle, add_service, get_vehicle_services,
-    generate_qr_code, get_total_stats, create_service_chart,
+    generate_qr_code, get_total_stats,
     create_cost_chart, filter_by_date, search_vehicle,
-    export_to_excel, validate_vehicle_data, validate_service_data,
-    decode_qr_from_image
+    validate_vehicle_data, validate_service_data,
+    decode_qr_from_image, compute_maintenance_due, get_period_stats,
+    apply_km_updates, get_change_log_path,
+    get_last_change_seq, export_changes, submit_job, get_job_status,
+    store_job_upload, get_shard_paths, list_shards, validate_shard_name,
+    get_total_stats_all_shards, suggest_plates, bulk_update_vehicles,
+    is_large_file, get_total_stats_streaming, aggregate_services_streaming,
+    filter_by_date_streaming, get_recent_services_streaming,
+    get_last_services_streaming, create_service_count_chart, INTEGRITY_ISSUES,
+    get_vehicle_summary, detect_cost_anomalies, score_service_cost
 )
 
 # Konfigurasi halaman
@@ -24,9 +34,32 @@ if not os.path.exists('data'):
 if not os.path.exists('qr'):
     os.makedirs('qr')
 
+# Pilih cabang (setiap cabang punya file data sendiri)
+st.sidebar.title("🏢 Cabang")
+shard_options = ['Pusat'] + list_shards()
+selected_shard = st.sidebar.selectbox("Data Cabang:", shard_options)
+with st.sidebar.expander("➕ Tambah Cabang"):
+    new_shard = st.text_input("Nama Cabang", placeholder="bandung", key="new_shard")
+    if st.button("Buat Cabang"):
+        is_valid, message = validate_shard_name(new_shard)
+        if is_valid:
+            get_shard_paths(new_shard)
+            st.rerun()
+        else:
+            st.error(f"❌ {message}")
+
 # File paths
-VEHICLE_FILE = 'data/vehicles.csv'
-SERVICE_FILE = 'data/service_log.csv'
+CURRENT_SHARD = None if selected_shard == 'Pusat' else selected_shard
+VEHICLE_FILE, SERVICE_FILE = get_shard_paths(CURRENT_SHARD)
+CHANGE_LOG_FILE = get_change_log_path(VEHICLE_FILE)
+ALL_SHARDS = [None] + list_shards()
+
+# File servis yang sangat besar diproses per potongan (tidak dimuat sekaligus)
+STREAMING_MODE = is_large_file(SERVICE_FILE)
+STREAMING_TABLE_ROWS = 5000
+
+# Jeda (detik) sebelum halaman dimuat ulang selama ada job yang antri/berjalan
+JOB_POLL_SECONDS = 2
 
 # Inisialisasi session state
 if 'current_page' not in st.session_state:
@@ -34,6 +67,33 @@ if 'current_page' not in st.session_state:
 if 'scanned_plat' not in st.session_state:
     st.session_state.scanned_plat = None
 
+# Tampilkan status job latar belakang yang disimpan di session state
+def render_job_status(session_key, download_label, mime=None):
+    job_id = st.session_state.get(session_key)
+    job = get_job_status(job_id) if job_id else None
+    if job is None:
+        return
+    
+    if job['status'] in ['antri', 'berjalan']:
+        st.progress(min(float(job.get('progress', 0)), 1.0), text=f"⏳ {job.get('pesan', '')}")
+        # Muat ulang otomatis di akhir skrip (lihat bagian paling bawah)
+        st.session_state['job_polling'] = True
+    elif job['status'] == 'selesai':
+        hasil = job.get('hasil')
+        if hasil and os.path.exists(str(hasil)):
+            with open(hasil, 'rb') as f:
+                st.download_button(
+                    label=download_label,
+                    data=f.read(),
+                    file_name=os.path.basename(hasil),
+                    mime=mime,
+                    key=f"download_{session_key}"
+                )
+        else:
+            st.success(f"✅ {hasil}")
+    else:
+        st.error(f"❌ Job gagal: {job.get('pesan', '')}")
+
 # Sidebar Menu
 st.sidebar.title("🚗 Menu Navigasi")
 menu = st.sidebar.radio(
@@ -48,22 +108,43 @@ if menu == 'Dashboard':
     
     # Load data
     df_vehicles = load_data(VEHICLE_FILE)
-    df_services = load_data(SERVICE_FILE)
+    if STREAMING_MODE:
+        # Hanya ringkasan yang disimpan di memori
+        df_services = get_last_services_streaming(SERVICE_FILE)
+        service_counts, _ = aggregate_services_streaming(SERVICE_FILE)
+        recent = get_recent_services_streaming(SERVICE_FILE, 5)
+    else:
+        df_services = load_data(SERVICE_FILE)
+        if not df_services.empty:
+            service_counts = df_services['plat_nomor'].value_counts()
+            recent = df_services.sort_values('tanggal', ascending=False).head(5)
+        else:
+            service_counts = pd.Series(dtype='int64')
+            recent = pd.DataFrame()
     
     # Statistik utama
+    combine_shards = st.checkbox("Gabungkan semua cabang", value=False)
     col1, col2, col3, col4 = st.columns(4)
     
-    stats = get_total_stats(df_vehicles, df_services)
+    if combine_shards:
+        stats = get_total_stats_all_shards(ALL_SHARDS)
+    elif STREAMING_MODE:
+        stats = get_total_stats_streaming(VEHICLE_FILE, SERVICE_FILE)
+    else:
+        stats = get_total_stats(df_vehicles, df_services, SERVICE_FILE)
     
     with col1:
         st.metric("Total Kendaraan", stats['total_vehicles'])
     with col2:
-        st.metric("Total Servis", stats['total_services'])
+        st.metric("Total Servis", stats['total_services'], help="Termasuk servis yang sudah diarsipkan")
     with col3:
         st.metric("Total Biaya", f"Rp {stats['total_cost']:,.0f}")
     with col4:
         st.metric("Servis Bulan Ini", stats['services_this_month'])
     
+    if combine_shards:
+        st.dataframe(stats['per_cabang'], use_container_width=True)
+    
     st.markdown("---")
     
     # Grafik dan data terbaru
@@ -71,16 +152,15 @@ if menu == 'Dashboard':
     
     with col1:
         st.subheader("📈 Grafik Servis per Kendaraan")
-        if not df_services.empty:
-            chart = create_service_chart(df_services)
+        if not service_counts.empty:
+            chart = create_service_count_chart(service_counts)
             st.plotly_chart(chart, use_container_width=True)
         else:
             st.info("Belum ada data servis untuk ditampilkan")
     
     with col2:
         st.subheader("📝 Servis Terbaru")
-        if not df_services.empty:
-            recent = df_services.sort_values('tanggal', ascending=False).head(5)
+        if not recent.empty:
             for idx, row in recent.iterrows():
                 with st.container():
                     st.write(f"**{row['plat_nomor']}** - {row['jenis_servis']}")
@@ -88,12 +168,36 @@ if menu == 'Dashboard':
                     st.markdown("---")
         else:
             st.info("Belum ada riwayat servis")
+    
+    st.markdown("---")
+    
+    # Jatuh tempo perawatan seluruh armada
+    st.subheader("⏰ Jatuh Tempo Perawatan")
+    df_due = compute_maintenance_due(df_vehicles, df_services)
+    
+    if not df_due.empty:
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            st.metric("Terlambat", int((df_due['status'] == 'Terlambat').sum()))
+        with col2:
+            st.metric("Segera", int((df_due['status'] == 'Segera').sum()))
+        with col3:
+            st.metric("Aman", int((df_due['status'] == 'Aman').sum()))
+        
+        st.dataframe(
+            df_due[['plat_nomor', 'jenis_servis', 'status', 'jatuh_tempo_tanggal',
+                    'jatuh_tempo_km', 'sisa_hari', 'sisa_km', 'km_terakhir']],
+            use_container_width=True,
+            height=300
+        )
+    else:
+        st.info("Belum ada kendaraan untuk dihitung jadwal perawatannya")
 
 # ===== HALAMAN DATA KENDARAAN =====
 elif menu == 'Data Kendaraan':
     st.title("🚗 Manajemen Data Kendaraan")
     
-    tab1, tab2, tab3, tab4 = st.tabs(["📋 Lihat Data", "➕ Tambah Kendaraan", "✏️ Edit Kendaraan", "🗑️ Hapus Kendaraan"])
+    tab1, tab2, tab3, tab4, tab5 = st.tabs(["📋 Lihat Data", "➕ Tambah Kendaraan", "✏️ Edit Kendaraan", "🗑️ Hapus Kendaraan", "🛣️ Import Odometer"])
     
     # Tab 1: Lihat Data
     with tab1:
@@ -119,6 +223,23 @@ elif menu == 'Data Kendaraan':
             
             st.dataframe(df_filtered, use_container_width=True, height=400)
             st.success(f"Menampilkan {len(df_filtered)} kendaraan")
+            
+            if st.button("📦 Generate Semua QR (ZIP)"):
+                st.session_state['job_bulk_qr'] = submit_job('bulk_qr', {'vehicle_file': VEHICLE_FILE})
+            render_job_status('job_bulk_qr', "📥 Download ZIP QR Code", mime="application/zip")
+            
+            # Cetak label QR untuk kendaraan hasil pencarian
+            col1, col2 = st.columns([1, 3])
+            with col1:
+                label_format = st.selectbox("Format Label", ['pdf', 'png'])
+            with col2:
+                st.write("")
+                st.write("")
+                if st.button(f"🖨️ Cetak Label QR ({len(df_filtered)} kendaraan)"):
+                    st.session_state['job_label_qr'] = submit_job(
+                        'label_qr', {'vehicle_file': VEHICLE_FILE, 'search_term': search_term, 'file_format': label_format}
+                    )
+            render_job_status('job_label_qr', "📥 Download Label QR")
         else:
             st.info("Belum ada data kendaraan. Silakan tambah kendaraan baru.")
     
@@ -244,6 +365,28 @@ elif menu == 'Data Kendaraan':
                             st.rerun()
                         else:
                             st.error("❌ Gagal mengupdate data!")
+            
+            # Edit banyak kendaraan sekaligus, disimpan dalam satu kali tulis
+            with st.expander("📝 Edit Massal"):
+                edited = st.data_editor(
+                    df_vehicles,
+                    disabled=['plat_nomor', 'tanggal_daftar'],
+                    use_container_width=True,
+                    key="bulk_editor"
+                )
+                if st.button("💾 Simpan Semua Perubahan"):
+                    changed = edited.astype(str) != df_vehicles.astype(str)
+                    patches = edited.astype(object).where(changed)
+                    patches['plat_nomor'] = df_vehicles['plat_nomor']
+                    patches = patches[changed.any(axis=1)]
+                    
+                    if patches.empty:
+                        st.info("Tidak ada perubahan")
+                    elif bulk_update_vehicles(VEHICLE_FILE, patches):
+                        st.success(f"✅ {len(patches)} kendaraan berhasil diupdate!")
+                        st.rerun()
+                    else:
+                        st.error("❌ Gagal mengupdate data!")
         else:
             st.info("Belum ada data kendaraan untuk diedit.")
     
@@ -269,8 +412,10 @@ elif menu == 'Data Kendaraan':
                     st.info(f"**Jenis:** {vehicle_info['jenis']}")
                 
                 confirm = st.checkbox("Saya yakin ingin menghapus kendaraan ini")
+                if STREAMING_MODE:
+                    st.warning("⚠️ File servis terlalu besar untuk ditulis ulang di mode streaming; hapus kendaraan dinonaktifkan.")
                 
-                if st.button("🗑️ Hapus Kendaraan", type="primary", disabled=not confirm):
+                if st.button("🗑️ Hapus Kendaraan", type="primary", disabled=not confirm or STREAMING_MODE):
                     success = delete_vehicle(VEHICLE_FILE, SERVICE_FILE, plat_delete)
                     if success:
                         st.success(f"✅ Kendaraan {plat_delete} berhasil dihapus!")
@@ -279,6 +424,23 @@ elif menu == 'Data Kendaraan':
                         st.error("❌ Gagal menghapus kendaraan!")
         else:
             st.info("Belum ada data kendaraan untuk dihapus.")
+    
+    # Tab 5: Import Odometer
+    with tab5:
+        st.subheader("Import Log Odometer")
+        st.info("💡 Upload file CSV dengan kolom **plat_nomor, km** (kolom lain seperti timestamp diabaikan). Kilometer terakhir tiap kendaraan akan diperbarui ke bacaan tertinggi.")
+        
+        odometer_file = st.file_uploader("📤 Upload Log Odometer", type=['csv'], key="odometer_upload")
+        
+        if odometer_file is not None and st.button("🛣️ Proses Odometer", use_container_width=True):
+            readings_path = store_job_upload(odometer_file.getvalue(), 'csv')
+            if readings_path:
+                st.session_state['job_import_odometer'] = submit_job(
+                    'import_odometer', {'vehicle_file': VEHICLE_FILE, 'readings_file': readings_path}
+                )
+            else:
+                st.error("❌ Gagal menyimpan file upload!")
+        render_job_status('job_import_odometer', "")
 
 # ===== HALAMAN SCAN QR CODE =====
 elif menu == 'Scan QR Code':
@@ -301,16 +463,19 @@ elif menu == 'Scan QR Code':
         )
         
         if uploaded_file is not None:
+            # Baca isi file sekali untuk ditampilkan dan di-decode
+            image_bytes = uploaded_file.getvalue()
+            
             # Tampilkan image yang diupload
             col1, col2 = st.columns([1, 2])
             
             with col1:
-                st.image(uploaded_file, caption="QR Code yang diupload", width=250)
+                st.image(image_bytes, caption="QR Code yang diupload", width=250)
             
             with col2:
                 with st.spinner("🔍 Membaca QR Code..."):
-                    # Decode QR Code
-                    plat_nomor = decode_qr_from_image(uploaded_file)
+                    # Decode QR Code (hasil di-cache per isi gambar)
+                    plat_nomor = decode_qr_from_image(image_bytes)
                     
                     if plat_nomor:
                         st.success(f"✅ QR Code berhasil dibaca: **{plat_nomor}**")
@@ -346,7 +511,7 @@ elif menu == 'Scan QR Code':
                     st.metric("🏍️ Jenis", vehicle['jenis'])
                     st.metric("🛣️ KM Terakhir", f"{vehicle['km_terakhir']:,} km")
                 
-                if vehicle['catatan']:
+                if pd.notna(vehicle['catatan']) and vehicle['catatan']:
                     st.info(f"📝 **Catatan:** {vehicle['catatan']}")
                 
                 st.markdown("---")
@@ -357,19 +522,24 @@ elif menu == 'Scan QR Code':
                 df_services = get_vehicle_services(SERVICE_FILE, plat_nomor)
                 
                 if not df_services.empty:
-                    # Statistik Servis
-                    col1, col2, col3 = st.columns(3)
-                    
-                    total_servis = len(df_services)
-                    total_biaya = df_services['biaya'].sum()
-                    avg_biaya = df_services['biaya'].mean()
-                    
-                    with col1:
-                        st.metric("Total Servis", total_servis)
-                    with col2:
-                        st.metric("Total Biaya", f"Rp {total_biaya:,.0f}")
-                    with col3:
-                        st.metric("Rata-rata Biaya", f"Rp {avg_biaya:,.0f}")
+                    # Statistik Servis (dari tabel ringkasan, tanpa menghitung ulang riwayat)
+                    summary = get_vehicle_summary(SERVICE_FILE, plat_nomor)
+                    if not summary.empty:
+                        ringkasan = summary.iloc[0]
+                        col1, col2, col3 = st.columns(3)
+                        with col1:
+                            st.metric("Total Servis", int(ringkasan['jumlah_servis']))
+                            st.metric("Biaya per KM", f"Rp {ringkasan['biaya_per_km']:,.0f}" if pd.notna(ringkasan['biaya_per_km']) else "-")
+                        with col2:
+                            st.metric("Total Biaya", f"Rp {ringkasan['total_biaya']:,.0f}")
+                            st.metric("Servis per Tahun", f"{ringkasan['servis_per_tahun']:.1f}" if pd.notna(ringkasan['servis_per_tahun']) else "-")
+                        with col3:
+                            st.metric("Rata-rata Biaya", f"Rp {ringkasan['rata_rata_biaya']:,.0f}")
+                            st.metric("Tren Biaya / Tahun", f"Rp {ringkasan['tren_biaya_per_tahun']:,.0f}" if pd.notna(ringkasan['tren_biaya_per_tahun']) else "-")
+                        
+                        servis_terakhir = json.loads(ringkasan['servis_terakhir'])
+                        if servis_terakhir:
+                            st.caption("Servis terakhir per jenis: " + " | ".join(f"{jenis}: {tgl}" for jenis, tgl in sorted(servis_terakhir.items())))
                     
                     st.markdown("---")
                     
@@ -393,13 +563,24 @@ elif menu == 'Scan QR Code':
                                 st.write(f"**KM Saat Servis:** {row['km_saat_servis']:,} km")
                                 st.write(f"**Biaya:** Rp {row['biaya']:,.0f}")
                                 st.write(f"**Teknisi:** {row['teknisi']}")
-                            if row['keterangan']:
+                            if pd.notna(row['keterangan']) and row['keterangan']:
                                 st.write(f"**Keterangan:** {row['keterangan']}")
                 else:
                     st.info("📭 Belum ada riwayat servis untuk kendaraan ini")
                 
             else:
                 st.error(f"❌ Kendaraan dengan plat nomor **{plat_nomor}** tidak ditemukan di database!")
+                
+                # Saran plat terdaftar yang paling mirip
+                suggestions = suggest_plates(VEHICLE_FILE, plat_nomor)
+                if suggestions:
+                    st.write("💡 Mungkin maksud Anda:")
+                    cols = st.columns(len(suggestions))
+                    for col, suggestion in zip(cols, suggestions):
+                        with col:
+                            if st.button(suggestion, key=f"saran_{suggestion}"):
+                                st.session_state.scanned_plat = suggestion
+                                st.rerun()
     
     # Tab 2: Input Manual
     with tab2:
@@ -464,12 +645,21 @@ elif menu == 'Scan QR Code':
                         success = add_service(SERVICE_FILE, service_data)
                         if success:
                             # Update KM terakhir di data kendaraan
-                            df_vehicles = load_data(VEHICLE_FILE)
-                            df_vehicles.loc[df_vehicles['plat_nomor'] == plat_service, 'km_terakhir'] = km_saat_servis
-                            save_data(VEHICLE_FILE, df_vehicles)
+                            apply_km_updates(VEHICLE_FILE, {plat_service: km_saat_servis})
                             
                             st.success(f"✅ Catatan servis untuk {plat_service} berhasil disimpan!")
-                            st.balloons()
+                            
+                            # Bandingkan biaya dengan baseline jenis servis & bengkel yang sama
+                            anomaly = score_service_cost(VEHICLE_FILE, SERVICE_FILE, service_data)
+                            if anomaly and anomaly['anomali']:
+                                kelipatan = f"{anomaly['kelipatan']:.1f}× " if anomaly['kelipatan'] else ""
+                                st.warning(
+                                    f"⚠️ Biaya Rp {biaya:,.0f} tidak wajar untuk {jenis_servis} di {bengkel or '-'}: "
+                                    f"{kelipatan}median Rp {anomaly['median_biaya']:,.0f} (skor {anomaly['skor']:.1f}). "
+                                    "Periksa kembali nota servis."
+                                )
+                            else:
+                                st.balloons()
                         else:
                             st.error("❌ Gagal menyimpan catatan servis!")
                     else:
@@ -482,10 +672,10 @@ elif menu == 'Laporan & Grafik':
     st.title("📊 Laporan & Analisis Data")
     st.markdown("---")
     
-    df_services = load_data(SERVICE_FILE)
+    df_services = pd.DataFrame() if STREAMING_MODE else load_data(SERVICE_FILE)
     df_vehicles = load_data(VEHICLE_FILE)
     
-    if not df_services.empty:
+    if STREAMING_MODE or not df_services.empty:
         # Filter tanggal
         col1, col2, col3 = st.columns(3)
         with col1:
@@ -496,33 +686,53 @@ elif menu == 'Laporan & Grafik':
             st.write("")
             st.write("")
             if st.button("📥 Export ke Excel"):
-                file_path = export_to_excel(df_vehicles, df_services)
-                with open(file_path, 'rb') as f:
-                    st.download_button(
-                        label="Download Excel",
-                        data=f,
-                        file_name=f"laporan_kendaraan_{datetime.now().strftime('%Y%m%d')}.xlsx",
-                        mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-                    )
+                # Export berjalan di latar belakang agar halaman tidak membeku
+                st.session_state['job_export_excel'] = submit_job(
+                    'export_excel', {'vehicle_file': VEHICLE_FILE, 'service_file': SERVICE_FILE}
+                )
+            render_job_status(
+                'job_export_excel', "Download Excel",
+                mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+            )
+            if len(ALL_SHARDS) > 1 and st.button("📥 Export Semua Cabang"):
+                st.session_state['job_export_semua_cabang'] = submit_job(
+                    'export_semua_cabang', {'shards': ALL_SHARDS}
+                )
+            render_job_status(
+                'job_export_semua_cabang', "Download Excel Semua Cabang",
+                mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+            )
         
         # Filter data berdasarkan tanggal
-        df_filtered = filter_by_date(df_services, str(start_date), str(end_date))
+        if STREAMING_MODE:
+            df_filtered = filter_by_date_streaming(SERVICE_FILE, str(start_date), str(end_date), max_rows=STREAMING_TABLE_ROWS)
+            service_counts, cost_by_type = aggregate_services_streaming(SERVICE_FILE, str(start_date), str(end_date))
+        else:
+            df_filtered = filter_by_date(df_services, str(start_date), str(end_date), service_file=SERVICE_FILE)
+            service_counts = df_filtered['plat_nomor'].value_counts() if not df_filtered.empty else pd.Series(dtype='int64')
+            cost_by_type = df_filtered
         
         st.markdown("---")
         
-        # Statistik periode
+        # Statistik periode (dari tabel rollup harian/bulanan)
+        period_stats = get_period_stats(SERVICE_FILE, start_date, end_date)
         col1, col2, col3, col4 = st.columns(4)
         with col1:
-            st.metric("Total Servis", len(df_filtered))
+            st.metric("Total Servis", period_stats['total_servis'])
         with col2:
-            total_biaya_periode = df_filtered['biaya'].sum()
-            st.metric("Total Biaya", f"Rp {total_biaya_periode:,.0f}")
+            st.metric("Total Biaya", f"Rp {period_stats['total_biaya']:,.0f}")
         with col3:
-            avg_biaya = df_filtered['biaya'].mean() if len(df_filtered) > 0 else 0
-            st.metric("Rata-rata Biaya", f"Rp {avg_biaya:,.0f}")
+            st.metric("Rata-rata Biaya", f"Rp {period_stats['rata_rata_biaya']:,.0f}")
         with col4:
-            unique_vehicles = df_filtered['plat_nomor'].nunique()
-            st.metric("Kendaraan Terservis", unique_vehicles)
+            st.metric("Kendaraan Terservis", period_stats['kendaraan_terservis'])
+        
+        # Rincian biaya per bengkel
+        if not period_stats['biaya_per_bengkel'].empty:
+            with st.expander("🏪 Total Biaya per Bengkel"):
+                st.dataframe(
+                    period_stats['biaya_per_bengkel'].rename('total_biaya').reset_index().rename(columns={'kunci': 'bengkel'}),
+                    use_container_width=True
+                )
         
         st.markdown("---")
         
@@ -531,12 +741,12 @@ elif menu == 'Laporan & Grafik':
         
         with col1:
             st.subheader("📈 Jumlah Servis per Kendaraan")
-            chart1 = create_service_chart(df_filtered)
+            chart1 = create_service_count_chart(service_counts)
             st.plotly_chart(chart1, use_container_width=True)
         
         with col2:
             st.subheader("💰 Total Biaya per Jenis Servis")
-            chart2 = create_cost_chart(df_filtered)
+            chart2 = create_cost_chart(cost_by_type)
             st.plotly_chart(chart2, use_container_width=True)
         
         st.markdown("---")
@@ -544,9 +754,111 @@ elif menu == 'Laporan & Grafik':
         # Tabel detail servis
         st.subheader("📋 Detail Servis Periode Terpilih")
         st.dataframe(df_filtered, use_container_width=True, height=400)
+        if STREAMING_MODE and len(df_filtered) >= STREAMING_TABLE_ROWS:
+            st.caption(f"File servis besar: tabel dibatasi {STREAMING_TABLE_ROWS} baris pertama. Grafik dan metrik tetap dihitung dari seluruh periode.")
         
     else:
         st.info("📊 Belum ada data servis untuk ditampilkan. Mulai tambahkan catatan servis!")
+    
+    st.markdown("---")
+    
+    # Peringkat biaya armada dari tabel ringkasan per kendaraan
+    st.subheader("🏆 Peringkat Biaya Kendaraan")
+    df_summary = get_vehicle_summary(SERVICE_FILE)
+    if not df_summary.empty:
+        ranking_metrics = {
+            'Total Biaya': 'total_biaya',
+            'Biaya per KM': 'biaya_per_km',
+            'Rata-rata Biaya': 'rata_rata_biaya',
+            'Servis per Tahun': 'servis_per_tahun',
+            'Tren Biaya per Tahun': 'tren_biaya_per_tahun'
+        }
+        col1, col2 = st.columns(2)
+        with col1:
+            ranking_label = st.selectbox("Urutkan berdasarkan", list(ranking_metrics.keys()))
+        with col2:
+            ranking_top = st.number_input("Jumlah kendaraan", min_value=5, max_value=500, value=20, step=5)
+        ranking_column = ranking_metrics[ranking_label]
+        df_ranking = df_summary.dropna(subset=[ranking_column]).nlargest(int(ranking_top), ranking_column)
+        if not df_vehicles.empty:
+            df_ranking = df_ranking.merge(df_vehicles[['plat_nomor', 'merk', 'model', 'jenis']], on='plat_nomor', how='left')
+        st.dataframe(
+            df_ranking.drop(columns=['sigma_hari', 'sigma_hari2', 'sigma_hari_biaya', 'servis_terakhir']),
+            use_container_width=True
+        )
+    else:
+        st.info("Belum ada ringkasan biaya kendaraan")
+    
+    st.markdown("---")
+    
+    # Deteksi biaya servis tidak wajar (median/MAD per jenis servis, jenis kendaraan & bengkel)
+    st.subheader("🚨 Biaya Servis Tidak Wajar")
+    if st.button("🔍 Pindai Seluruh Log Servis"):
+        st.session_state['anomali_biaya'] = detect_cost_anomalies(VEHICLE_FILE, SERVICE_FILE)
+    df_anomalies = st.session_state.get('anomali_biaya')
+    if df_anomalies is not None:
+        if not df_anomalies.empty:
+            st.dataframe(df_anomalies, use_container_width=True)
+            st.caption("Skor = modified z-score terhadap median biaya kelompoknya; |skor| ≥ 3.5 dianggap tidak wajar.")
+        else:
+            st.success("✅ Tidak ada biaya servis yang tidak wajar")
+    
+    st.markdown("---")
+    
+    # Arsip servis lama ke segmen terkompresi
+    with st.expander("🗄️ Arsip Servis Lama"):
+        st.caption("Servis sebelum tanggal cutoff dipindahkan ke arsip terkompresi (read-only). Laporan, riwayat kendaraan dan export tetap menyertakan data arsip bila diperlukan.")
+        cutoff_date = st.date_input("Arsipkan servis sebelum", value=datetime(datetime.now().year - 2, 1, 1))
+        if STREAMING_MODE:
+            st.warning("⚠️ Arsip memuat seluruh file servis; dinonaktifkan di mode streaming.")
+        if st.button("🗄️ Arsipkan", disabled=STREAMING_MODE):
+            st.session_state['job_arsip_servis'] = submit_job(
+                'arsip_servis', {'service_file': SERVICE_FILE, 'cutoff_date': str(cutoff_date)}
+            )
+        render_job_status('job_arsip_servis', "")
+    
+    # Pemeriksaan & perbaikan integritas data servis
+    with st.expander("🩺 Cek Integritas Data"):
+        st.caption("Memeriksa file servis per potongan: plat tanpa kendaraan, baris / id_servis duplikat, tanggal tidak valid, dan km yang mundur.")
+        if st.button("🔍 Jalankan Pemeriksaan"):
+            st.session_state['job_cek_integritas'] = submit_job(
+                'cek_integritas', {'vehicle_file': VEHICLE_FILE, 'service_file': SERVICE_FILE}
+            )
+        render_job_status('job_cek_integritas', "Download Temuan", mime="text/csv")
+        
+        masalah_dipilih = st.multiselect("Masalah yang diperbaiki", INTEGRITY_ISSUES, default=INTEGRITY_ISSUES)
+        st.caption("id_duplikat diberi id_servis baru, masalah lain dipindah ke file karantina.")
+        if st.button("🛠️ Perbaiki / Karantina", disabled=not masalah_dipilih):
+            st.session_state['job_perbaiki_integritas'] = submit_job(
+                'perbaiki_integritas',
+                {'vehicle_file': VEHICLE_FILE, 'service_file': SERVICE_FILE, 'masalah': masalah_dipilih}
+            )
+        render_job_status('job_perbaiki_integritas', "")
+    
+    # Export delta perubahan untuk sinkronisasi sistem lain
+    st.subheader("🔄 Export Perubahan (Sinkronisasi)")
+    last_seq = get_last_change_seq(CHANGE_LOG_FILE)
+    st.caption(f"Nomor urut perubahan terakhir: {last_seq}")
+    
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        since_seq = st.number_input("Perubahan setelah seq", min_value=0, value=0, step=1)
+    with col2:
+        delta_format = st.selectbox("Format", ['csv', 'xlsx', 'jsonl'])
+    with col3:
+        st.write("")
+        st.write("")
+        if st.button("📤 Export Perubahan"):
+            delta_path = export_changes(CHANGE_LOG_FILE, since_seq, delta_format)
+            if delta_path:
+                with open(delta_path, 'rb') as f:
+                    st.download_button(
+                        label="Download Perubahan",
+                        data=f,
+                        file_name=os.path.basename(delta_path)
+                    )
+            else:
+                st.error("❌ Gagal export perubahan!")
 
 # ===== HALAMAN TENTANG APLIKASI =====
 elif menu == 'Tentang Aplikasi':
@@ -638,3 +950,9 @@ elif menu == 'Tentang Aplikasi':
     
     st.markdown("---")
     st.success("✅ Dibuat sesuai aturan: Tanpa Class/OOP, Menggunakan Fungsi, Storage CSV, QR Code Integration")
+
+# Selama masih ada job yang antri/berjalan, muat ulang halaman setelah jeda singkat.
+# Dilakukan di akhir skrip agar seluruh halaman sudah tampil sebelum menunggu.
+if st.session_state.pop('job_polling', False):
+    time.sleep(JOB_POLL_SECONDS)
+    st.rerun()
@@ -4,20 +4,100 @@ import qrcode
 from datetime import datetime
 import plotly.express as px
 import plotly.graph_objects as go
-from PIL import Image
+from PIL import Image, ImageDraw, ImageFont
 from pyzbar.pyzbar import decode
 import io
+import re
+import csv
+import json
+import hashlib
+import tempfile
+import base64
+import threading
+import uuid
+import zipfile
+import zlib
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+import numpy as np
+import pyarrow as pa
+import pyarrow.feather as feather
+
+# Kunci file antar-proses: fcntl (Linux/macOS) atau msvcrt (Windows)
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+    import msvcrt
+
+# Interval perawatan per (jenis kendaraan, jenis servis): (interval km, interval bulan)
+SERVICE_INTERVALS = {
+    ('Motor', 'Ganti Oli'): (2000, 2),
+    ('Motor', 'Service Berkala'): (4000, 4),
+    ('Motor', 'Tune Up'): (8000, 6),
+    ('Motor', 'Ganti Ban'): (15000, 24),
+    ('Motor', 'Ganti Aki'): (20000, 24),
+    ('Mobil', 'Ganti Oli'): (5000, 6),
+    ('Mobil', 'Service Berkala'): (10000, 6),
+    ('Mobil', 'Tune Up'): (20000, 12),
+    ('Mobil', 'Ganti Ban'): (40000, 36),
+    ('Mobil', 'Ganti Aki'): (40000, 24),
+}
+
+# Folder data per cabang (shard): data/cabang/<nama>/vehicles.csv & service_log.csv
+SHARD_ROOT = 'data/cabang'
+
+# Mode streaming untuk file servis yang terlalu besar untuk dimuat sekaligus
+STREAMING_THRESHOLD_BYTES = 200 * 1024 * 1024
+SERVICE_CHUNKSIZE = 100000
+
+# Cache tabel snapshot per proses: {path_snapshot: (kunci_file, pyarrow.Table)}
+_SNAPSHOT_CACHE = {}
+
+# Cache hasil decode QR berdasarkan hash isi gambar (LRU, per proses)
+QR_DECODE_CACHE_SIZE = 128
+_QR_DECODE_CACHE = OrderedDict()
+_QR_DECODE_LOCK = threading.Lock()
+
+# Indeks BK-tree plat nomor per file kendaraan (untuk saran plat mirip)
+_PLATE_INDEX = {}
+_PLATE_INDEX_LOCK = threading.Lock()
+
+# Indeks offset byte baris servis per plat: {service_file: (kunci_file, {plat: [(offset, panjang)]})}
+_SERVICE_INDEX = {}
+_SERVICE_INDEX_LOCK = threading.RLock()
+
+# Kunci tulis per file (thread + proses), lihat file_lock()
+_FILE_LOCKS = {}
+_FILE_LOCKS_GUARD = threading.Lock()
+_FILE_LOCK_STATE = threading.local()
+
+# Antrian job latar belakang (per proses Streamlit)
+JOB_DIR = 'data/jobs'
+_JOB_EXECUTOR = ThreadPoolExecutor(max_workers=2, thread_name_prefix='job')
+_JOB_LOCK = threading.Lock()
+_JOB_ACTIVE = {}  # {kunci_job: job_id} untuk job yang sedang antri/berjalan
 
 # ===== FUNGSI 1: LOAD DATA =====
 def load_data(file_path):
 
     try:
         if os.path.exists(file_path):
+            # Pakai snapshot Arrow (memory-mapped) jika masih sesuai dengan CSV
+            df = load_snapshot(file_path)
+            if df is not None:
+                return df
             df = pd.read_csv(file_path)
+            # Kembalikan lewat snapshot agar dtype sama dengan pembacaan berikutnya
+            if write_snapshot(file_path, df):
+                df_snapshot = load_snapshot(file_path)
+                if df_snapshot is not None:
+                    return df_snapshot
             return df
         else:
             # Buat file baru jika belum ada
-            if 'vehicles' in file_path:
+            if 'vehicles' in os.path.basename(file_path):
                 df = pd.DataFrame(columns=[
                     'plat_nomor', 'merk', 'model', 'tahun', 'jenis', 
                     'warna', 'km_terakhir', 'catatan', 'tanggal_daftar'
@@ -29,6 +109,10 @@ def load_data(file_path):
                 ])
             df.to_csv(file_path, index=False)
             return df
+    except MemoryError:
+        # Jangan dikembalikan sebagai DataFrame kosong: jalur tulis bisa menimpa seluruh file
+        print(f"Error loading data: {file_path} terlalu besar untuk dimuat, gunakan fungsi *_streaming")
+        raise
     except Exception as e:
         print(f"Error loading data: {e}")
         return pd.DataFrame()
@@ -38,28 +122,64 @@ def save_data(file_path, dataframe):
 
     try:
         dataframe.to_csv(file_path, index=False)
+        # Perbarui snapshot agar semua proses worker melihat data terbaru;
+        # dibaca ulang dari CSV supaya dtype & nilai kosong sama dengan load_data
+        write_snapshot(file_path, pd.read_csv(file_path))
+        # File ditulis ulang (compaction): offset lama tidak berlaku, bangun ulang indeksnya
+        if os.path.exists(get_service_index_path(file_path)):
+            build_service_index(file_path)
         return True
     except Exception as e:
         print(f"Error saving data: {e}")
         return False
 
+def append_rows(file_path, dataframe):
+    """
+    Menambahkan baris ke akhir file CSV tanpa menulis ulang isi lama
+    Parameter:
+        - file_path (string): path file CSV (header sudah ada)
+        - dataframe (DataFrame): baris baru dengan urutan kolom sama seperti file
+    Return: Boolean (True jika sukses)
+    """
+    try:
+        # Pastikan baris terakhir file sudah diakhiri enter
+        with open(file_path, 'rb') as f:
+            f.seek(0, os.SEEK_END)
+            if f.tell() > 0:
+                f.seek(-1, os.SEEK_END)
+                if f.read(1) != b'\n':
+                    with open(file_path, 'a') as fa:
+                        fa.write('\n')
+        dataframe.to_csv(file_path, mode='a', header=False, index=False)
+        return True
+    except Exception as e:
+        print(f"Error appending data: {e}")
+        return False
+
 # ===== FUNGSI 3: ADD VEHICLE (CREATE) =====
 def add_vehicle(file_path, vehicle_data):
 
     try:
-        df = load_data(file_path)
+        # Baca-ubah-tulis file kendaraan dikunci agar tidak menimpa penulis lain (app / api)
+        with file_lock(file_path):
+            df = load_data(file_path)
+        
+            # Tambahkan tanggal pendaftaran
+            vehicle_data['tanggal_daftar'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
         
-        # Tambahkan tanggal pendaftaran
-        vehicle_data['tanggal_daftar'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+            # Buat DataFrame baru dari data kendaraan
+            new_row = pd.DataFrame([vehicle_data])
         
-        # Buat DataFrame baru dari data kendaraan
-        new_row = pd.DataFrame([vehicle_data])
+            # Gabungkan dengan data existing
+            df = pd.concat([df, new_row], ignore_index=True)
         
-        # Gabungkan dengan data existing
-        df = pd.concat([df, new_row], ignore_index=True)
+            # Simpan ke CSV
+            if not save_data(file_path, df):
+                return False
         
-        # Simpan ke CSV
-        return save_data(file_path, df)
+            log_changes(file_path, 'tambah', 'kendaraan', [(vehicle_data['plat_nomor'], vehicle_data)])
+        index_plate(file_path, vehicle_data['plat_nomor'])
+        return True
     except Exception as e:
         print(f"Error adding vehicle: {e}")
         return False
@@ -74,17 +194,8 @@ def update_vehicle(file_path, plat_nomor, updated_data):
         - updated_data (dict): data baru
     Return: Boolean (True jika sukses)
     """
-    try:
-        df = load_data(file_path)
-        
-        # Update data
-        for key, value in updated_data.items():
-            df.loc[df['plat_nomor'] == plat_nomor, key] = value
-        
-        return save_data(file_path, df)
-    except Exception as e:
-        print(f"Error updating vehicle: {e}")
-        return False
+    # Kasus satu kendaraan dari update massal
+    return bulk_update_vehicles(file_path, {plat_nomor: updated_data})
 
 # ===== FUNGSI 5: DELETE VEHICLE (DELETE) =====
 def delete_vehicle(vehicle_file, service_file, plat_nomor):
@@ -97,16 +208,32 @@ def delete_vehicle(vehicle_file, service_file, plat_nomor):
     Return: Boolean (True jika sukses)
     """
     try:
-        # Hapus dari data kendaraan
-        df_vehicles = load_data(vehicle_file)
-        df_vehicles = df_vehicles[df_vehicles['plat_nomor'] != plat_nomor]
-        save_data(vehicle_file, df_vehicles)
+        # Hapus riwayat servis (termasuk yang sudah diarsipkan); dikunci seperti jalur append
+        with file_lock(service_file):
+            df_services = load_data(service_file)
+            archived_removed = remove_plate_from_archive(service_file, plat_nomor)
+            removed = df_services[df_services['plat_nomor'] == plat_nomor] if not df_services.empty else pd.DataFrame()
+            if not removed.empty:
+                save_data(service_file, df_services[df_services['plat_nomor'] != plat_nomor])
+            if not archived_removed.empty:
+                removed = pd.concat([removed.astype(object), archived_removed.astype(object)], ignore_index=True)
+            
+            # Bitmap plat tidak bisa dikurangi, rollup dibangun ulang (juga jika hanya arsip yang terhapus)
+            if not removed.empty:
+                build_rollups(service_file)
+                log_changes(service_file, 'hapus', 'servis', [
+                    (id_servis, {'plat_nomor': plat_nomor}) for id_servis in removed['id_servis'].tolist()
+                ])
         
-        # Hapus riwayat servis
-        df_services = load_data(service_file)
-        if not df_services.empty:
-            df_services = df_services[df_services['plat_nomor'] != plat_nomor]
-            save_data(service_file, df_services)
+        # Hapus dari data kendaraan (setelah servis, agar gagal baca servis tidak meninggalkan servis yatim)
+        with file_lock(vehicle_file):
+            df_vehicles = load_data(vehicle_file)
+            df_vehicles = df_vehicles[df_vehicles['plat_nomor'] != plat_nomor]
+            save_data(vehicle_file, df_vehicles)
+        
+        remove_from_vehicle_summary(service_file, plat_nomor)
+        log_changes(vehicle_file, 'hapus', 'kendaraan', [(plat_nomor, {'plat_nomor': plat_nomor})])
+        unindex_plate(vehicle_file, plat_nomor)
         
         # Hapus QR Code file jika ada
         qr_path = f"qr/QR_{plat_nomor}.png"
@@ -127,29 +254,67 @@ def add_service(file_path, service_data):
         - service_data (dict): data servis
     Return: Boolean (True jika sukses)
     """
+    success, _ = add_services_batch(file_path, [service_data])
+    return success
+
+def add_services_batch(file_path, services):
+    """
+    Menambah banyak catatan servis sekaligus: satu kali baca untuk id,
+    satu kali append ke file, dan satu kali update rollup / ringkasan / log
+    Parameter:
+        - file_path (string): path file CSV
+        - services (list): daftar dict data servis (id_servis diisi otomatis)
+    Return: Tuple (Boolean, list id_servis baru)
+    """
     try:
-        df = load_data(file_path)
-        
-        # Generate ID servis otomatis
-        if df.empty:
-            service_id = 'SRV001'
-        else:
-            last_id = df['id_servis'].iloc[-1] if 'id_servis' in df.columns else 'SRV000'
-            num = int(last_id.replace('SRV', '')) + 1
-            service_id = f'SRV{num:03d}'
-        
-        service_data['id_servis'] = service_id
-        
-        # Buat DataFrame baru
-        new_row = pd.DataFrame([service_data])
-        
-        # Gabungkan
-        df = pd.concat([df, new_row], ignore_index=True)
-        
-        return save_data(file_path, df)
+        if not services:
+            return True, []
+        # Kunci file (lintas thread & proses: Streamlit, api.py, job) agar id tidak bentrok
+        with file_lock(file_path):
+            # File besar (mode streaming) tidak dimuat penuh: kolom dari header, id dari penanda
+            large = is_large_file(file_path)
+            df = None if large else load_data(file_path)
+            columns = list(pd.read_csv(file_path, nrows=0).columns) if large else list(df.columns)
+            
+            # Generate ID servis otomatis: nomor tertinggi (bukan baris terakhir), termasuk
+            # id hasil perbaikan dan id yang sudah pindah ke arsip
+            num = _last_service_number(file_path, df)
+            
+            service_ids = [f'SRV{num + i + 1:03d}' for i in range(len(services))]
+            for service_id, service_data in zip(service_ids, services):
+                service_data['id_servis'] = service_id
+            
+            # Buat DataFrame baru
+            new_rows = pd.DataFrame(services)
+            
+            if len(columns) and set(new_rows.columns).issubset(columns):
+                # Tambahkan di akhir file tanpa menulis ulang, lalu perpanjang indeks offset
+                previous_key = _file_key(file_path)
+                if not append_rows(file_path, new_rows.reindex(columns=columns)):
+                    return False, []
+                if df is not None:
+                    df = pd.concat([df, _csv_round_trip(new_rows.reindex(columns=columns), df.dtypes)], ignore_index=True)
+                    write_snapshot(file_path, df)
+                extend_service_index(file_path, previous_key)
+            elif large:
+                print(f"Error adding service: kolom baru tidak bisa ditambahkan ke {file_path} tanpa memuat seluruh file")
+                return False, []
+            else:
+                # Ada kolom baru: tulis ulang seluruh file
+                df = pd.concat([df, new_rows], ignore_index=True)
+                if not save_data(file_path, df):
+                    return False, []
+            
+            _write_id_mark(get_service_id_mark_path(file_path), num + len(services))
+            
+            # Perbarui rollup laporan dengan baris baru saja
+            update_rollups(file_path, new_rows)
+            update_vehicle_summary(file_path, new_rows)
+            log_changes(file_path, 'tambah', 'servis', list(zip(service_ids, services)))
+        return True, service_ids
     except Exception as e:
         print(f"Error adding service: {e}")
-        return False
+        return False, []
 
 # ===== FUNGSI 7: GET VEHICLE SERVICES (READ) =====
 def get_vehicle_services(file_path, plat_nomor):
@@ -161,14 +326,24 @@ def get_vehicle_services(file_path, plat_nomor):
     Return: DataFrame pandas
     """
     try:
-        df = load_data(file_path)
-        if not df.empty:
-            df_filtered = df[df['plat_nomor'] == plat_nomor]
-            # Urutkan berdasarkan tanggal terbaru
-            if not df_filtered.empty:
-                df_filtered = df_filtered.sort_values('tanggal', ascending=False)
-            return df_filtered
-        return pd.DataFrame()
+        # Baca hanya baris plat ini lewat indeks offset; parse penuh jika indeks gagal
+        df_filtered = read_plate_services(file_path, plat_nomor) if os.path.exists(file_path) else None
+        if df_filtered is None:
+            df = load_data(file_path)
+            if not df.empty:
+                df_filtered = df[df['plat_nomor'] == plat_nomor]
+            else:
+                df_filtered = pd.DataFrame()
+        
+        # Tambahkan riwayat lama dari arsip hanya jika plat ini ada di arsip
+        df_archived = load_archived_services(file_path, plat_nomor=plat_nomor)
+        if not df_archived.empty:
+            df_filtered = pd.concat([df_filtered.astype(object), df_archived.astype(object)], ignore_index=True)
+        
+        # Urutkan berdasarkan tanggal terbaru
+        if not df_filtered.empty:
+            df_filtered = df_filtered.sort_values('tanggal', ascending=False)
+        return df_filtered
     except Exception as e:
         print(f"Error getting vehicle services: {e}")
         return pd.DataFrame()
@@ -209,8 +384,8 @@ def generate_qr_code(plat_nomor):
         return None
 
 # ===== FUNGSI 9: GET TOTAL STATS =====
-def get_total_stats(df_vehicles, df_services):
-
+def get_total_stats(df_vehicles, df_services, service_file=None):
+    # service_file diisi agar servis yang sudah diarsipkan ikut dihitung (sama seperti laporan)
     try:
         total_vehicles = len(df_vehicles) if not df_vehicles.empty else 0
         total_services = len(df_services) if not df_services.empty else 0
@@ -221,10 +396,16 @@ def get_total_stats(df_vehicles, df_services):
         if not df_services.empty:
             total_cost = df_services['biaya'].sum()
             
-            # Hitung servis bulan ini
-            current_month = datetime.now().strftime('%Y-%m')
-            df_services['tanggal'] = pd.to_datetime(df_services['tanggal'])
-            services_this_month = len(df_services[df_services['tanggal'].dt.strftime('%Y-%m') == current_month])
+            # Hitung servis bulan ini (perbandingan rentang tanggal, tanpa format string)
+            month_start = pd.Timestamp(datetime.now()).normalize().replace(day=1)
+            next_month = month_start + pd.offsets.MonthBegin(1)
+            tanggal = pd.to_datetime(df_services['tanggal'], errors='coerce')
+            services_this_month = int(((tanggal >= month_start) & (tanggal < next_month)).sum())
+        
+        if service_file is not None:
+            archived = get_archive_totals(service_file)
+            total_services += archived['total_services']
+            total_cost += archived['total_cost']
         
         return {
             'total_vehicles': total_vehicles,
@@ -251,7 +432,22 @@ def create_service_chart(df_services):
             return fig
         
         # Hitung jumlah servis per kendaraan
-        service_counts = df_services['plat_nomor'].value_counts().reset_index()
+        return create_service_count_chart(df_services['plat_nomor'].value_counts())
+    except Exception as e:
+        print(f"Error creating service chart: {e}")
+        fig = go.Figure()
+        fig.add_annotation(text="Error membuat grafik", showarrow=False)
+        return fig
+
+def create_service_count_chart(counts_per_plate):
+    # Bar chart dari jumlah servis per plat yang sudah dihitung (Series plat -> jumlah)
+    try:
+        if counts_per_plate.empty:
+            fig = go.Figure()
+            fig.add_annotation(text="Tidak ada data", showarrow=False)
+            return fig
+        
+        service_counts = counts_per_plate.sort_values(ascending=False).reset_index()
         service_counts.columns = ['plat_nomor', 'jumlah_servis']
         
         # Buat bar chart
@@ -316,9 +512,15 @@ def create_cost_chart(df_services):
         return fig
 
 # ===== FUNGSI 12: FILTER BY DATE =====
-def filter_by_date(df_services, start_date, end_date):
+def filter_by_date(df_services, start_date, end_date, service_file=None):
 
     try:
+        # Sertakan arsip jika rentang tanggal menyentuh data yang sudah diarsipkan
+        if service_file:
+            df_archived = load_archived_services(service_file, start_date=start_date, end_date=end_date)
+            if not df_archived.empty:
+                df_services = pd.concat([df_services.astype(object), df_archived.astype(object)], ignore_index=True)
+        
         if df_services.empty:
             return df_services
         
@@ -441,8 +643,23 @@ def validate_service_data(service_data):
 def decode_qr_from_image(uploaded_file):
 
     try:
+        # Baca isi file sekali (bisa berupa bytes atau file upload)
+        if isinstance(uploaded_file, (bytes, bytearray)):
+            image_bytes = bytes(uploaded_file)
+        elif hasattr(uploaded_file, 'getvalue'):
+            image_bytes = uploaded_file.getvalue()
+        else:
+            image_bytes = uploaded_file.read()
+        
+        # Hasil decode disimpan berdasarkan hash isi gambar
+        cache_key = hashlib.sha256(image_bytes).hexdigest()
+        with _QR_DECODE_LOCK:
+            if cache_key in _QR_DECODE_CACHE:
+                _QR_DECODE_CACHE.move_to_end(cache_key)
+                return _QR_DECODE_CACHE[cache_key]
+        
         # Baca image
-        image = Image.open(uploaded_file)
+        image = Image.open(io.BytesIO(image_bytes))
         
         # Decode QR Code
         decoded_objects = decode(image)
@@ -450,10 +667,2789 @@ def decode_qr_from_image(uploaded_file):
         # Ambil data dari QR pertama yang ditemukan
         if decoded_objects:
             qr_data = decoded_objects[0].data.decode('utf-8')
-            return qr_data
         else:
-            return None
+            qr_data = None
+        
+        # Simpan ke cache, buang entri yang paling lama tidak dipakai
+        with _QR_DECODE_LOCK:
+            _QR_DECODE_CACHE[cache_key] = qr_data
+            while len(_QR_DECODE_CACHE) > QR_DECODE_CACHE_SIZE:
+                _QR_DECODE_CACHE.popitem(last=False)
+        
+        return qr_data
             
     except Exception as e:
         print(f"Error decoding QR: {e}")
-        return None
\ No newline at end of file
+        return None
+
+# ===== FUNGSI 18: WRITE SNAPSHOT =====
+# dtype teks snapshot: string Arrow dengan NaN sebagai nilai kosong (sama seperti
+# hasil pd.read_csv), dan tipe Arrow yang disimpan langsung oleh dtype tersebut
+try:
+    SNAPSHOT_STRING_DTYPE = pd.StringDtype('pyarrow', na_value=np.nan)
+except TypeError:
+    SNAPSHOT_STRING_DTYPE = pd.StringDtype('pyarrow_numpy')
+_SNAPSHOT_STRING_TYPE = pa.array(pd.array([''], dtype=SNAPSHOT_STRING_DTYPE)).type
+
+def _snapshot_types(arrow_type):
+    if pa.types.is_string(arrow_type) or pa.types.is_large_string(arrow_type):
+        return SNAPSHOT_STRING_DTYPE
+    return None
+
+def get_snapshot_path(file_path):
+    return os.path.splitext(file_path)[0] + '.arrow'
+
+def write_snapshot(file_path, dataframe):
+    """
+    Menulis snapshot Arrow IPC (Feather v2 tanpa kompresi) dari data CSV
+    agar bisa di-memory-map oleh semua proses Streamlit
+    Parameter:
+        - file_path (string): path file CSV sumber
+        - dataframe (DataFrame): isi terbaru file CSV tersebut
+    Return: Boolean (True jika sukses)
+    """
+    try:
+        snapshot_path = get_snapshot_path(file_path)
+        tmp_path = f"{snapshot_path}.{os.getpid()}.tmp"
+
+        # Simpan ukuran & waktu ubah CSV agar snapshot basi bisa dikenali
+        csv_stat = os.stat(file_path)
+        table = pa.Table.from_pandas(dataframe, preserve_index=False)
+        # Kolom teks disimpan dengan tipe string yang dipakai pandas terpasang,
+        # supaya saat dibaca cukup dibungkus (zero-copy), bukan disalin
+        table = table.cast(pa.schema([
+            pa.field(field.name, _SNAPSHOT_STRING_TYPE) if pa.types.is_string(field.type) or pa.types.is_large_string(field.type) else field
+            for field in table.schema
+        ], metadata=table.schema.metadata))
+        metadata = dict(table.schema.metadata or {})
+        metadata[b'sumber_mtime_ns'] = str(csv_stat.st_mtime_ns).encode()
+        metadata[b'sumber_size'] = str(csv_stat.st_size).encode()
+        table = table.replace_schema_metadata(metadata)
+
+        # Tulis ke file sementara lalu ganti secara atomik
+        feather.write_feather(table, tmp_path, compression='uncompressed')
+        os.replace(tmp_path, snapshot_path)
+        return True
+    except Exception as e:
+        print(f"Error writing snapshot: {e}")
+        return False
+
+def _csv_round_trip(dataframe, dtypes):
+    # Baris baru diubah seperti hasil tulis-baca CSV ('' -> NaN, angka -> numerik)
+    # lalu disamakan dengan dtype kolom file, agar snapshot = pd.read_csv(file)
+    buffer = io.StringIO()
+    dataframe.to_csv(buffer, index=False)
+    buffer.seek(0)
+    rows = pd.read_csv(buffer)
+    for column, dtype in dtypes.items():
+        if column in rows.columns and rows[column].dtype != dtype:
+            try:
+                rows[column] = rows[column].astype(dtype)
+            except (TypeError, ValueError):
+                pass
+    return rows
+
+# ===== FUNGSI 19: LOAD SNAPSHOT =====
+def load_snapshot(file_path):
+    """
+    Membaca snapshot Arrow secara memory-mapped (tanpa parse ulang CSV)
+    Parameter:
+        - file_path (string): path file CSV sumber
+    Return: DataFrame pandas (kolom teks ber-dtype string Arrow yang langsung
+            menunjuk ke memory map) atau None jika snapshot belum ada / sudah
+            tidak sesuai dengan CSV
+    """
+    try:
+        snapshot_path = get_snapshot_path(file_path)
+        if not os.path.exists(snapshot_path) or not os.path.exists(file_path):
+            return None
+
+        # Map ulang hanya jika file snapshot sudah diganti
+        snap_stat = os.stat(snapshot_path)
+        file_key = (snap_stat.st_ino, snap_stat.st_mtime_ns, snap_stat.st_size)
+        cached = _SNAPSHOT_CACHE.get(snapshot_path)
+        if cached is not None and cached[0] == file_key:
+            table = cached[1]
+        else:
+            source = pa.memory_map(snapshot_path, 'r')
+            table = pa.ipc.open_file(source).read_all()
+            _SNAPSHOT_CACHE[snapshot_path] = (file_key, table)
+
+        # Pastikan snapshot dibuat dari versi CSV yang sama
+        csv_stat = os.stat(file_path)
+        metadata = table.schema.metadata or {}
+        if (metadata.get(b'sumber_mtime_ns') != str(csv_stat.st_mtime_ns).encode()
+                or metadata.get(b'sumber_size') != str(csv_stat.st_size).encode()):
+            return None
+
+        # Teks dibungkus sebagai string Arrow (tanpa salinan objek Python per proses)
+        return table.to_pandas(types_mapper=_snapshot_types, split_blocks=True)
+    except Exception as e:
+        print(f"Error loading snapshot: {e}")
+        return None
+
+# ===== FUNGSI 20: COMPUTE MAINTENANCE DUE =====
+def compute_maintenance_due(df_vehicles, df_services, intervals=None, today=None):
+    """
+    Menghitung jadwal servis berikutnya (tanggal & km) untuk seluruh armada
+    Parameter:
+        - df_vehicles (DataFrame): data kendaraan
+        - df_services (DataFrame): data riwayat servis
+        - intervals (dict): {(jenis, jenis_servis): (interval_km, interval_bulan)},
+          default SERVICE_INTERVALS
+        - today (datetime): tanggal acuan, default hari ini
+    Return: DataFrame pandas, diurutkan dari yang paling mendesak
+    """
+    columns = [
+        'plat_nomor', 'jenis', 'jenis_servis', 'tanggal_servis_terakhir',
+        'km_servis_terakhir', 'km_terakhir', 'jatuh_tempo_tanggal',
+        'jatuh_tempo_km', 'sisa_hari', 'sisa_km', 'urgensi', 'status'
+    ]
+    try:
+        if df_vehicles.empty:
+            return pd.DataFrame(columns=columns)
+
+        if intervals is None:
+            intervals = SERVICE_INTERVALS
+        today = pd.Timestamp(today if today is not None else datetime.now()).normalize()
+
+        df_interval = pd.DataFrame(
+            [(jenis, jenis_servis, km, bulan) for (jenis, jenis_servis), (km, bulan) in intervals.items()],
+            columns=['jenis', 'jenis_servis', 'interval_km', 'interval_bulan']
+        )
+
+        # Setiap kendaraan dipasangkan dengan semua jenis servis yang berlaku untuknya
+        due = df_vehicles[['plat_nomor', 'jenis', 'km_terakhir', 'tanggal_daftar']].merge(df_interval, on='jenis')
+
+        # Servis terakhir per (plat, jenis servis) dalam satu groupby
+        if not df_services.empty:
+            servis = pd.DataFrame({
+                'plat_nomor': df_services['plat_nomor'],
+                'jenis_servis': df_services['jenis_servis'],
+                'tanggal': pd.to_datetime(df_services['tanggal'], errors='coerce'),
+                'km_saat_servis': pd.to_numeric(df_services['km_saat_servis'], errors='coerce')
+            }).dropna(subset=['tanggal'])
+            terakhir = servis.groupby(['plat_nomor', 'jenis_servis'], as_index=False).agg(
+                tanggal_servis_terakhir=('tanggal', 'max'),
+                km_servis_terakhir=('km_saat_servis', 'max')
+            )
+            due = due.merge(terakhir, on=['plat_nomor', 'jenis_servis'], how='left')
+        else:
+            due['tanggal_servis_terakhir'] = pd.NaT
+            due['km_servis_terakhir'] = np.nan
+
+        # Kendaraan yang belum pernah diservis dihitung dari tanggal daftar & km 0
+        tanggal_daftar = pd.to_datetime(due['tanggal_daftar'], errors='coerce').dt.normalize()
+        base_tanggal = pd.to_datetime(due['tanggal_servis_terakhir']).fillna(tanggal_daftar).fillna(today)
+        base_km = pd.to_numeric(due['km_servis_terakhir'], errors='coerce').fillna(0).astype(float)
+        km_sekarang = np.maximum(pd.to_numeric(due['km_terakhir'], errors='coerce').fillna(0).astype(float), base_km)
+
+        # 1 bulan dihitung 30 hari
+        interval_hari = due['interval_bulan'] * 30
+        due['km_terakhir'] = km_sekarang
+        due['jatuh_tempo_tanggal'] = base_tanggal + pd.to_timedelta(interval_hari, unit='D')
+        due['jatuh_tempo_km'] = base_km + due['interval_km']
+        due['sisa_hari'] = (due['jatuh_tempo_tanggal'] - today).dt.days
+        due['sisa_km'] = due['jatuh_tempo_km'] - km_sekarang
+
+        # Urgensi = sisa terkecil (km atau waktu) relatif terhadap intervalnya
+        due['urgensi'] = np.minimum(due['sisa_km'] / due['interval_km'], due['sisa_hari'] / interval_hari)
+        due['status'] = np.select(
+            [due['urgensi'] < 0, due['urgensi'] < 0.2],
+            ['Terlambat', 'Segera'],
+            default='Aman'
+        )
+
+        due = due.sort_values('urgensi', kind='stable').reset_index(drop=True)
+        return due[columns]
+    except Exception as e:
+        print(f"Error computing maintenance due: {e}")
+        return pd.DataFrame(columns=columns)
+
+# ===== FUNGSI 21: BUILD ROLLUPS =====
+# Rollup per periode untuk total, jenis servis dan bengkel. Jumlah kendaraan
+# unik disimpan sebagai bitmap id plat (terkompresi) pada baris dimensi 'total',
+# sehingga bisa digabung antar periode tanpa menyimpan dimensi per plat.
+ROLLUP_DIMENSIONS = ['total', 'jenis_servis', 'bengkel']
+ROLLUP_COLUMNS = ['periode', 'dimensi', 'kunci', 'jumlah_servis', 'total_biaya', 'plat']
+ROLLUP_KEYS = ['periode', 'dimensi', 'kunci']
+ROLLUP_COMPACT_ROWS = 2000  # baris tambahan (append) sebelum file rollup dipadatkan
+
+# Cache id plat untuk bitmap rollup: {path: (kunci_file, {plat: id})}
+_ROLLUP_PLATE_IDS = {}
+
+def get_rollup_paths(service_file):
+    base = os.path.splitext(service_file)[0]
+    return base + '_rollup_harian.csv', base + '_rollup_bulanan.csv'
+
+def get_rollup_plate_id_path(service_file):
+    return os.path.splitext(service_file)[0] + '_rollup_plat.csv'
+
+def _encode_plate_bitmap(ids):
+    bits = np.zeros(int(np.max(ids)) + 1, dtype=bool)
+    bits[np.asarray(ids, dtype=np.int64)] = True
+    return base64.b64encode(zlib.compress(np.packbits(bits, bitorder='little').tobytes())).decode('ascii')
+
+def _union_plate_bitmaps(encoded):
+    # OR beberapa bitmap (panjang boleh berbeda) -> array boolean
+    union = np.zeros(0, dtype=bool)
+    for text in encoded:
+        bits = np.unpackbits(
+            np.frombuffer(zlib.decompress(base64.b64decode(text)), dtype=np.uint8), bitorder='little'
+        ).astype(bool)
+        if len(bits) > len(union):
+            union = np.concatenate([union, np.zeros(len(bits) - len(union), dtype=bool)])
+        union[:len(bits)] |= bits
+    return union
+
+def _combine_plate_bitmaps(encoded):
+    encoded = [text for text in encoded if isinstance(text, str) and text]
+    if len(encoded) <= 1:
+        return encoded[0] if encoded else np.nan
+    return _encode_plate_bitmap(np.flatnonzero(_union_plate_bitmaps(encoded)))
+
+def _load_rollup_plate_ids(service_file):
+    id_path = get_rollup_plate_id_path(service_file)
+    if not os.path.exists(id_path):
+        return {}
+    file_key = _file_key(id_path)
+    cached = _ROLLUP_PLATE_IDS.get(id_path)
+    if cached is None or cached[0] != file_key:
+        df_ids = pd.read_csv(id_path, dtype={'plat_nomor': str})
+        cached = (file_key, dict(zip(df_ids['plat_nomor'], df_ids['id'].astype(int))))
+        _ROLLUP_PLATE_IDS[id_path] = cached
+    return cached[1]
+
+def _assign_plate_ids(plate_ids, plates):
+    # Plat baru mendapat id berikutnya; mengembalikan daftar plat yang baru
+    new_plates = [plat for plat in pd.unique(plates.astype(object).dropna()) if plat not in plate_ids]
+    for plat in new_plates:
+        plate_ids[plat] = len(plate_ids)
+    return new_plates
+
+def _aggregate_rollups(df_services, plate_ids):
+    # Ringkas baris servis menjadi rollup harian & bulanan (format panjang)
+    if df_services.empty:
+        empty = pd.DataFrame(columns=ROLLUP_COLUMNS)
+        return empty, empty.copy()
+
+    tanggal = pd.to_datetime(df_services['tanggal'], errors='coerce')
+    base = pd.DataFrame({
+        'harian': tanggal.dt.strftime('%Y-%m-%d'),
+        'bulanan': tanggal.dt.strftime('%Y-%m'),
+        'total': 'semua',
+        'jenis_servis': df_services['jenis_servis'].astype(object).fillna('-'),
+        'bengkel': df_services['bengkel'].astype(object).fillna('-'),
+        'plat_id': df_services['plat_nomor'].astype(object).map(plate_ids),
+        'biaya': pd.to_numeric(df_services['biaya'], errors='coerce').fillna(0)
+    })[tanggal.notna()]
+
+    result = []
+    for level in ['harian', 'bulanan']:
+        parts = []
+        for dimensi in ROLLUP_DIMENSIONS:
+            part = base.groupby([level, dimensi], as_index=False).agg(
+                jumlah_servis=('biaya', 'size'),
+                total_biaya=('biaya', 'sum')
+            )
+            part.columns = ['periode', 'kunci', 'jumlah_servis', 'total_biaya']
+            part['dimensi'] = dimensi
+            if dimensi == 'total':
+                plat = base.dropna(subset=['plat_id']).groupby(level)['plat_id'].agg(_encode_plate_bitmap)
+                part['plat'] = part['periode'].map(plat)
+            else:
+                part['plat'] = np.nan
+            parts.append(part[ROLLUP_COLUMNS])
+        result.append(pd.concat(parts, ignore_index=True))
+    return result[0], result[1]
+
+def _merge_rollup(parts):
+    # Jumlahkan baris dengan kunci yang sama, gabungkan bitmap plat (OR)
+    parts = [part for part in parts if not part.empty]
+    if not parts:
+        return pd.DataFrame(columns=ROLLUP_COLUMNS)
+    merged = pd.concat(parts, ignore_index=True)
+    sums = merged.groupby(ROLLUP_KEYS, as_index=False)[['jumlah_servis', 'total_biaya']].sum()
+    plat = merged.dropna(subset=['plat']).groupby(ROLLUP_KEYS, as_index=False)['plat'].agg(_combine_plate_bitmaps)
+    sums = sums.merge(plat, on=ROLLUP_KEYS, how='left')
+    return sums[sums['jumlah_servis'] > 0][ROLLUP_COLUMNS]
+
+def _read_rollup(rollup_path, lock_path):
+    # File rollup bisa berisi baris tambahan hasil append; dijumlahkan saat dibaca
+    # dan dipadatkan sesekali jika baris tambahannya sudah banyak. lock_path = file
+    # rollup harian: satu kunci untuk semua penulisan kedua file rollup
+    raw = pd.read_csv(rollup_path, dtype={'periode': str, 'dimensi': str, 'kunci': str, 'plat': str})
+    merged = _merge_rollup([raw])
+    if len(raw) - len(merged) > ROLLUP_COMPACT_ROWS:
+        with file_lock(lock_path):
+            raw = pd.read_csv(rollup_path, dtype={'periode': str, 'dimensi': str, 'kunci': str, 'plat': str})
+            merged = _merge_rollup([raw])
+            tmp_path = f"{rollup_path}.{os.getpid()}.tmp"
+            merged.to_csv(tmp_path, index=False)
+            os.replace(tmp_path, rollup_path)
+    return merged
+
+def build_rollups(service_file, chunksize=100000):
+    """
+    Membangun ulang tabel rollup harian & bulanan dari file servis
+    (dibaca per potongan agar memori tetap kecil)
+    Parameter:
+        - service_file (string): path file CSV servis
+        - chunksize (int): jumlah baris per potongan
+    Return: Boolean (True jika sukses)
+    """
+    try:
+        daily_path, monthly_path = get_rollup_paths(service_file)
+        with file_lock(daily_path):
+            daily = pd.DataFrame(columns=ROLLUP_COLUMNS)
+            monthly = pd.DataFrame(columns=ROLLUP_COLUMNS)
+            plate_ids = {}
+
+            # Rollup mencakup file aktif dan semua segmen arsip
+            sources = [service_file] + list_archive_segments(service_file)
+            usecols = ['plat_nomor', 'tanggal', 'jenis_servis', 'bengkel', 'biaya']
+            for source in sources:
+                if not os.path.exists(source):
+                    continue
+                for chunk in pd.read_csv(source, usecols=usecols, chunksize=chunksize):
+                    _assign_plate_ids(plate_ids, chunk['plat_nomor'])
+                    chunk_daily, chunk_monthly = _aggregate_rollups(chunk, plate_ids)
+                    daily = _merge_rollup([daily, chunk_daily])
+                    monthly = _merge_rollup([monthly, chunk_monthly])
+
+            pd.DataFrame({'plat_nomor': list(plate_ids.keys()), 'id': list(plate_ids.values())}).to_csv(
+                get_rollup_plate_id_path(service_file), index=False
+            )
+            daily.to_csv(daily_path, index=False)
+            monthly.to_csv(monthly_path, index=False)
+        return True
+    except Exception as e:
+        print(f"Error building rollups: {e}")
+        return False
+
+# ===== FUNGSI 22: UPDATE ROLLUPS =====
+def update_rollups(service_file, df_new):
+    """
+    Memperbarui rollup secara inkremental saat servis ditambah: hanya baris
+    periode yang tersentuh yang di-append (tanpa menulis ulang file rollup).
+    Penghapusan servis membangun ulang rollup lewat build_rollups.
+    Parameter:
+        - service_file (string): path file CSV servis
+        - df_new (DataFrame): baris servis yang ditambahkan
+    Return: Boolean (True jika sukses)
+    """
+    try:
+        daily_path, monthly_path = get_rollup_paths(service_file)
+        with file_lock(daily_path):
+            id_path = get_rollup_plate_id_path(service_file)
+            if not all(os.path.exists(path) for path in [daily_path, monthly_path, id_path]):
+                return build_rollups(service_file)
+
+            plate_ids = dict(_load_rollup_plate_ids(service_file))
+            new_plates = _assign_plate_ids(plate_ids, df_new['plat_nomor'])
+            if new_plates:
+                pd.DataFrame({'plat_nomor': new_plates, 'id': [plate_ids[plat] for plat in new_plates]}).to_csv(
+                    id_path, mode='a', header=False, index=False
+                )
+
+            delta_daily, delta_monthly = _aggregate_rollups(df_new, plate_ids)
+            delta_daily.to_csv(daily_path, mode='a', header=False, index=False)
+            delta_monthly.to_csv(monthly_path, mode='a', header=False, index=False)
+        return True
+    except Exception as e:
+        print(f"Error updating rollups: {e}")
+        return False
+
+# ===== FUNGSI 23: GET PERIOD STATS =====
+def get_period_stats(service_file, start_date, end_date):
+    """
+    Menghitung statistik laporan untuk rentang tanggal dari tabel rollup.
+    Bulan penuh diambil dari rollup bulanan, sisa hari di tepi rentang
+    dari rollup harian.
+    Parameter:
+        - service_file (string): path file CSV servis
+        - start_date, end_date (string/date): rentang tanggal (inklusif)
+    Return: Dictionary statistik periode
+    """
+    result = {
+        'total_servis': 0,
+        'total_biaya': 0,
+        'rata_rata_biaya': 0,
+        'kendaraan_terservis': 0,
+        'biaya_per_jenis': pd.Series(dtype=float),
+        'biaya_per_bengkel': pd.Series(dtype=float)
+    }
+    try:
+        daily_path, monthly_path = get_rollup_paths(service_file)
+
+        # Bangun ulang jika rollup belum ada atau lebih lama dari file servis
+        stale = (
+            not os.path.exists(daily_path) or not os.path.exists(monthly_path)
+            or (os.path.exists(service_file)
+                and os.path.getmtime(daily_path) < os.path.getmtime(service_file))
+        )
+        if stale:
+            build_rollups(service_file)
+
+        start = pd.Timestamp(start_date).normalize()
+        end = pd.Timestamp(end_date).normalize()
+        if end < start:
+            return result
+
+        # Bulan yang tercakup penuh oleh rentang
+        first_month = start.to_period('M') if start.day == 1 else start.to_period('M') + 1
+        last_month = end.to_period('M') if end.is_month_end else end.to_period('M') - 1
+
+        daily = _read_rollup(daily_path, daily_path)
+        if first_month <= last_month:
+            monthly = _read_rollup(monthly_path, daily_path)
+            in_months = monthly[(monthly['periode'] >= str(first_month)) & (monthly['periode'] <= str(last_month))]
+            head_end = first_month.start_time.strftime('%Y-%m-%d')
+            tail_start = last_month.end_time.strftime('%Y-%m-%d')
+            in_days = daily[
+                ((daily['periode'] >= start.strftime('%Y-%m-%d')) & (daily['periode'] < head_end))
+                | ((daily['periode'] > tail_start) & (daily['periode'] <= end.strftime('%Y-%m-%d')))
+            ]
+            selected = pd.concat([in_months, in_days], ignore_index=True)
+        else:
+            selected = daily[(daily['periode'] >= start.strftime('%Y-%m-%d')) & (daily['periode'] <= end.strftime('%Y-%m-%d'))]
+
+        if selected.empty:
+            return result
+
+        totals = selected[selected['dimensi'] == 'total']
+        total_servis = int(totals['jumlah_servis'].sum())
+        total_biaya = totals['total_biaya'].sum()
+
+        result['total_servis'] = total_servis
+        result['total_biaya'] = total_biaya
+        result['rata_rata_biaya'] = total_biaya / total_servis if total_servis > 0 else 0
+        result['kendaraan_terservis'] = int(_union_plate_bitmaps(totals['plat'].dropna()).sum())
+        result['biaya_per_jenis'] = (
+            selected[selected['dimensi'] == 'jenis_servis'].groupby('kunci')['total_biaya'].sum().sort_values(ascending=False)
+        )
+        result['biaya_per_bengkel'] = (
+            selected[selected['dimensi'] == 'bengkel'].groupby('kunci')['total_biaya'].sum().sort_values(ascending=False)
+        )
+        return result
+    except Exception as e:
+        print(f"Error calculating period stats: {e}")
+        return result
+
+# ===== FUNGSI 24: APPLY KM UPDATES =====
+def apply_km_updates(vehicle_file, km_updates):
+    """
+    Memperbarui km_terakhir banyak kendaraan sekaligus dalam satu kali simpan.
+    Kilometer hanya dinaikkan (odometer tidak pernah mundur).
+    Parameter:
+        - vehicle_file (string): path file CSV kendaraan
+        - km_updates (dict / Series): {plat_nomor: km}
+    Return: Boolean (True jika sukses)
+    """
+    try:
+        km_baru = pd.to_numeric(pd.Series(km_updates, dtype=object), errors='coerce').dropna()
+        if km_baru.empty:
+            return True
+        km_baru = km_baru.groupby(level=0).max()
+
+        # Baca-ubah-tulis dikunci: thread api.py dan proses Streamlit bisa menulis bersamaan
+        with file_lock(vehicle_file):
+            df = load_data(vehicle_file)
+            if df.empty:
+                return True
+
+            km_lama = pd.to_numeric(df['km_terakhir'], errors='coerce').fillna(0).astype(float)
+            km_target = df['plat_nomor'].astype(object).map(km_baru).astype(float)
+            changed = km_target > km_lama
+            if not changed.any():
+                return True
+
+            # Hanya baris yang berubah yang ditulis; km kosong di baris lain tetap kosong
+            km_updated = km_target[changed].round().astype('int64')
+            df.loc[changed, 'km_terakhir'] = km_updated
+            if not save_data(vehicle_file, df):
+                return False
+        
+            log_changes(vehicle_file, 'ubah', 'kendaraan', [
+                (plat, {'km_terakhir': km}) for plat, km in zip(df.loc[changed, 'plat_nomor'].tolist(), km_updated.tolist())
+            ])
+        touch_plate_index(vehicle_file)
+        return True
+    except Exception as e:
+        print(f"Error applying km updates: {e}")
+        return False
+
+# ===== FUNGSI 25: INGEST ODOMETER READINGS =====
+def ingest_odometer_readings(vehicle_file, readings_file, chunksize=50000):
+    """
+    Membaca log odometer (kolom plat_nomor & km; kolom lain seperti timestamp
+    diabaikan) secara bertahap, mengambil km maksimum per plat, lalu
+    menerapkannya sekaligus
+    Parameter:
+        - vehicle_file (string): path file CSV kendaraan
+        - readings_file (string / file): file CSV pembacaan odometer
+        - chunksize (int): jumlah baris per potongan
+    Return: Tuple (Boolean, pesan)
+    """
+    try:
+        total_readings = 0
+        km_max = pd.Series(dtype=float)
+
+        for chunk in pd.read_csv(readings_file, usecols=['plat_nomor', 'km'], chunksize=chunksize):
+            total_readings += len(chunk)
+            chunk_km = pd.to_numeric(chunk['km'], errors='coerce')
+            chunk_max = chunk_km.groupby(chunk['plat_nomor'].astype(str).str.strip()).max()
+            km_max = pd.concat([km_max, chunk_max]).groupby(level=0).max()
+
+        if km_max.empty:
+            return False, "File odometer tidak berisi data"
+
+        if not apply_km_updates(vehicle_file, km_max):
+            return False, "Gagal memperbarui kilometer kendaraan"
+
+        return True, f"{total_readings} pembacaan diproses untuk {len(km_max)} plat nomor"
+    except ValueError as e:
+        return False, f"Format file tidak valid (kolom wajib: plat_nomor, km): {e}"
+    except Exception as e:
+        print(f"Error ingesting odometer readings: {e}")
+        return False, f"Error import odometer: {str(e)}"
+
+# ===== FUNGSI 26: LOG CHANGES =====
+CHANGE_LOG_COLUMNS = ['seq', 'waktu', 'operasi', 'entitas', 'kunci', 'data']
+
+def get_change_log_path(file_path):
+    # Satu change log per folder data (kendaraan & servis berbagi urutan seq)
+    return os.path.join(os.path.dirname(file_path), 'change_log.csv')
+
+def get_last_change_seq(change_log_file):
+    """
+    Mengambil nomor urut (seq) terakhir di change log tanpa membaca seluruh file
+    Parameter: change_log_file (string)
+    Return: Integer (0 jika log masih kosong)
+    """
+    try:
+        if not os.path.exists(change_log_file):
+            return 0
+        with open(change_log_file, 'rb') as f:
+            f.seek(0, os.SEEK_END)
+            size = f.tell()
+            block = min(size, 4096)
+            while True:
+                f.seek(size - block)
+                lines = [line for line in f.read(block).splitlines() if line.strip()]
+                # Baris pertama blok bisa terpotong, kecuali blok sudah mencakup awal file
+                if len(lines) >= 2 or block == size:
+                    break
+                block = min(size, block * 2)
+        last_line = lines[-1] if lines else b''
+        seq = last_line.split(b',', 1)[0]
+        return int(seq) if seq.isdigit() else 0
+    except Exception as e:
+        print(f"Error reading change log: {e}")
+        return 0
+
+def _acquire_os_lock(f):
+    if fcntl is not None:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        return
+    while True:
+        try:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+            return
+        except OSError:
+            continue
+
+def _release_os_lock(f):
+    if fcntl is not None:
+        fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+    else:
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+@contextmanager
+def file_lock(path):
+    """
+    Mengunci <path>.lock secara eksklusif untuk semua thread dan proses
+    (Streamlit worker, job latar belakang, api.py). Bisa dipakai bertingkat
+    oleh thread yang sama.
+    Parameter: path (string): file yang dilindungi
+    """
+    with _FILE_LOCKS_GUARD:
+        thread_lock = _FILE_LOCKS.setdefault(path, threading.RLock())
+    with thread_lock:
+        depths = getattr(_FILE_LOCK_STATE, 'depths', None)
+        if depths is None:
+            depths = _FILE_LOCK_STATE.depths = {}
+        if depths.get(path, 0) > 0:
+            depths[path] += 1
+            try:
+                yield
+            finally:
+                depths[path] -= 1
+            return
+
+        with open(f"{path}.lock", 'a+b') as lock_file:
+            _acquire_os_lock(lock_file)
+            depths[path] = 1
+            try:
+                yield
+            finally:
+                depths[path] = 0
+                _release_os_lock(lock_file)
+
+def log_changes(file_path, operasi, entitas, records):
+    """
+    Menambahkan catatan perubahan ke change log dengan seq yang terus naik
+    Parameter:
+        - file_path (string): path file data yang berubah
+        - operasi (string): 'tambah', 'ubah', atau 'hapus'
+        - entitas (string): 'kendaraan' atau 'servis'
+        - records (list): daftar tuple (kunci, dict data)
+    Return: Boolean (True jika sukses)
+    """
+    try:
+        if not records:
+            return True
+        change_log_file = get_change_log_path(file_path)
+        waktu = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        with file_lock(change_log_file):
+            _append_change_records(change_log_file, operasi, entitas, records, waktu)
+        return True
+    except Exception as e:
+        print(f"Error logging changes: {e}")
+        return False
+
+def _append_change_records(change_log_file, operasi, entitas, records, waktu):
+    # Dipanggil di bawah file_lock: baca seq terakhir lalu append tanpa diselingi penulis lain
+    last_seq = get_last_change_seq(change_log_file)
+    df_log = pd.DataFrame([
+        {
+            'seq': last_seq + i + 1,
+            'waktu': waktu,
+            'operasi': operasi,
+            'entitas': entitas,
+            'kunci': kunci,
+            'data': json.dumps(data, default=str, ensure_ascii=False)
+        }
+        for i, (kunci, data) in enumerate(records)
+    ], columns=CHANGE_LOG_COLUMNS)
+
+    # Hanya menambah di akhir file, tidak menulis ulang log
+    write_header = not os.path.exists(change_log_file)
+    df_log.to_csv(change_log_file, mode='a', header=write_header, index=False)
+
+# ===== FUNGSI 27: GET CHANGES SINCE =====
+def _find_seq_offset(change_log_file, since_seq):
+    # Binary search posisi byte baris pertama dengan seq > since_seq
+    # (seq selalu naik dan setiap catatan menempati tepat satu baris)
+    with open(change_log_file, 'rb') as f:
+        f.readline()
+        lo = f.tell()
+        f.seek(0, os.SEEK_END)
+        hi = f.tell()
+
+        while lo < hi:
+            mid = (lo + hi) // 2
+            f.seek(mid)
+            if mid > lo:
+                f.readline()
+            pos = f.tell()
+
+            if pos >= hi:
+                # Sisa rentang kecil, cari linear dari lo
+                f.seek(lo)
+                while f.tell() < hi:
+                    line_start = f.tell()
+                    line = f.readline()
+                    if int(line.split(b',', 1)[0]) > since_seq:
+                        return line_start
+                return hi
+
+            line = f.readline()
+            if int(line.split(b',', 1)[0]) <= since_seq:
+                lo = pos + len(line)
+            else:
+                hi = pos
+        return lo
+
+def get_changes_since(change_log_file, since_seq=0):
+    """
+    Mengambil semua perubahan dengan seq lebih besar dari since_seq
+    Parameter:
+        - change_log_file (string): path change log
+        - since_seq (int): seq terakhir yang sudah disinkronkan
+    Return: DataFrame pandas
+    """
+    try:
+        if not os.path.exists(change_log_file):
+            return pd.DataFrame(columns=CHANGE_LOG_COLUMNS)
+
+        offset = _find_seq_offset(change_log_file, int(since_seq))
+        with open(change_log_file, 'rb') as f:
+            f.seek(offset)
+            if not f.read(1):
+                return pd.DataFrame(columns=CHANGE_LOG_COLUMNS)
+            f.seek(offset)
+            return pd.read_csv(f, header=None, names=CHANGE_LOG_COLUMNS, dtype={'kunci': str, 'data': str})
+    except Exception as e:
+        print(f"Error reading changes: {e}")
+        return pd.DataFrame(columns=CHANGE_LOG_COLUMNS)
+
+# ===== FUNGSI 28: EXPORT CHANGES =====
+def export_changes(change_log_file, since_seq=0, file_format='csv'):
+    """
+    Export delta perubahan sejak seq tertentu (CSV, Excel, atau JSON lines)
+    Parameter:
+        - change_log_file (string): path change log
+        - since_seq (int): seq terakhir yang sudah disinkronkan
+        - file_format (string): 'csv', 'xlsx', atau 'jsonl'
+    Return: string (path file export) atau None
+    """
+    try:
+        df_changes = get_changes_since(change_log_file, since_seq)
+        last_seq = int(df_changes['seq'].max()) if not df_changes.empty else int(since_seq)
+
+        file_name = f"perubahan_{int(since_seq)}_{last_seq}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{file_format}"
+        file_path = os.path.join(os.path.dirname(change_log_file), file_name)
+
+        if file_format == 'csv':
+            df_changes.to_csv(file_path, index=False)
+        elif file_format == 'xlsx':
+            df_changes.to_excel(file_path, sheet_name='Perubahan', index=False, engine='openpyxl')
+        elif file_format == 'jsonl':
+            # Kolom data ditulis sebagai objek JSON, bukan string
+            with open(file_path, 'w', encoding='utf-8') as f:
+                for record in df_changes.to_dict('records'):
+                    record['data'] = json.loads(record['data']) if isinstance(record['data'], str) else None
+                    f.write(json.dumps(record, default=str, ensure_ascii=False) + '\n')
+        else:
+            print(f"Format export tidak dikenal: {file_format}")
+            return None
+
+        return file_path
+    except Exception as e:
+        print(f"Error exporting changes: {e}")
+        return None
+
+# ===== FUNGSI 29: SUBMIT JOB =====
+JOB_STATUS_ACTIVE = ['antri', 'berjalan']
+
+def _job_state_path(job_id):
+    return os.path.join(JOB_DIR, f"{job_id}.json")
+
+def _job_active_path(job_key):
+    # Penanda job aktif per kunci job, dibagi semua proses (berisi job_id)
+    return os.path.join(JOB_DIR, f"aktif_{job_key}.txt")
+
+def _job_process_alive(pid):
+    # Cek proses pemilik job masih hidup (sinyal 0 hanya tersedia di POSIX)
+    if not pid:
+        return False
+    if os.name == 'nt':
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+def _clear_job_active(job_key, job_id):
+    # Hapus penanda hanya jika masih menunjuk ke job ini
+    active_path = _job_active_path(job_key)
+    with file_lock(active_path):
+        if os.path.exists(active_path):
+            with open(active_path, 'r', encoding='utf-8') as f:
+                current_id = f.read().strip()
+            if current_id == job_id:
+                os.remove(active_path)
+
+def _write_job_state(job_id, **fields):
+    # Simpan status job ke data/jobs/<job_id>.json secara atomik
+    with _JOB_LOCK:
+        state = get_job_status(job_id) or {}
+        state.update(fields)
+        state['diperbarui'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        tmp_path = _job_state_path(job_id) + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(state, f, default=str, ensure_ascii=False)
+        os.replace(tmp_path, _job_state_path(job_id))
+    return state
+
+def _run_job(job_id, job_key, jenis, params):
+    def progress(fraction, pesan=''):
+        _write_job_state(job_id, progress=round(float(fraction), 3), pesan=pesan)
+
+    try:
+        _write_job_state(job_id, status='berjalan', pesan='Memulai...')
+        hasil = JOB_FUNCTIONS[jenis](params, progress)
+        _write_job_state(job_id, status='selesai', progress=1.0, pesan='Selesai', hasil=hasil)
+    except Exception as e:
+        print(f"Error running job {job_id}: {e}")
+        _write_job_state(job_id, status='gagal', pesan=str(e))
+    finally:
+        with _JOB_LOCK:
+            if _JOB_ACTIVE.get(job_key) == job_id:
+                del _JOB_ACTIVE[job_key]
+        _clear_job_active(job_key, job_id)
+
+def submit_job(jenis, params):
+    """
+    Mengirim pekerjaan lambat ke worker pool latar belakang.
+    Job identik (jenis & parameter sama) yang masih antri/berjalan tidak
+    diulang, termasuk yang dikirim proses lain (penanda di data/jobs).
+    Parameter:
+        - jenis (string): nama job di JOB_FUNCTIONS
+        - params (dict): parameter job (harus bisa di-JSON-kan)
+    Return: string (job_id) atau None jika gagal
+    """
+    try:
+        if jenis not in JOB_FUNCTIONS:
+            print(f"Jenis job tidak dikenal: {jenis}")
+            return None
+
+        job_key = hashlib.sha1(
+            json.dumps([jenis, params], sort_keys=True, default=str).encode('utf-8')
+        ).hexdigest()
+
+        if not os.path.exists(JOB_DIR):
+            os.makedirs(JOB_DIR)
+
+        # Cek & daftarkan penanda dalam satu kunci agar proses lain tidak
+        # mengirim job yang sama di antara keduanya
+        active_path = _job_active_path(job_key)
+        with file_lock(active_path):
+            if os.path.exists(active_path):
+                with open(active_path, 'r', encoding='utf-8') as f:
+                    active_id = f.read().strip()
+                active_state = get_job_status(active_id)
+                if active_state and active_state.get('status') in JOB_STATUS_ACTIVE:
+                    return active_id
+
+            job_id = f"{jenis}_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:6]}"
+            with _JOB_LOCK:
+                _JOB_ACTIVE[job_key] = job_id
+            _write_job_state(
+                job_id, id=job_id, jenis=jenis, params=params, status='antri',
+                progress=0.0, pesan='Menunggu worker', hasil=None, pid=os.getpid(),
+                kunci=job_key, dibuat=datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+            )
+            with open(active_path, 'w', encoding='utf-8') as f:
+                f.write(job_id)
+
+        _JOB_EXECUTOR.submit(_run_job, job_id, job_key, jenis, params)
+        return job_id
+    except Exception as e:
+        print(f"Error submitting job: {e}")
+        return None
+
+def store_job_upload(file_bytes, extension='csv'):
+    """
+    Menyimpan file upload agar bisa dibaca job latar belakang.
+    Nama file = hash isi, sehingga upload yang sama menghasilkan job yang sama.
+    Parameter:
+        - file_bytes (bytes): isi file upload
+        - extension (string): ekstensi file
+    Return: string (path file) atau None
+    """
+    try:
+        upload_dir = os.path.join(JOB_DIR, 'uploads')
+        if not os.path.exists(upload_dir):
+            os.makedirs(upload_dir)
+        file_path = os.path.join(upload_dir, f"{hashlib.sha1(file_bytes).hexdigest()}.{extension}")
+        if not os.path.exists(file_path):
+            with open(file_path, 'wb') as f:
+                f.write(file_bytes)
+        return file_path
+    except Exception as e:
+        print(f"Error storing upload: {e}")
+        return None
+
+# ===== FUNGSI 30: GET JOB STATUS =====
+def get_job_status(job_id):
+    """
+    Membaca status job dari data/jobs
+    Parameter: job_id (string)
+    Return: Dictionary status job atau None jika tidak ada
+    """
+    try:
+        job_path = _job_state_path(job_id)
+        if not job_id or not os.path.exists(job_path):
+            return None
+        with open(job_path, 'r', encoding='utf-8') as f:
+            state = json.load(f)
+
+        # Job aktif milik proses ini yang tidak lagi terdaftar, atau milik proses
+        # lain yang sudah mati, berarti terputus sebelum selesai
+        if state.get('status') in JOB_STATUS_ACTIVE:
+            if state.get('pid') == os.getpid():
+                interrupted = job_id not in _JOB_ACTIVE.values()
+            else:
+                interrupted = not _job_process_alive(state.get('pid'))
+            if interrupted:
+                state['status'] = 'gagal'
+                state['pesan'] = 'Job terputus sebelum selesai'
+        return state
+    except Exception as e:
+        print(f"Error reading job status: {e}")
+        return None
+
+# ===== FUNGSI 31: JOB FUNCTIONS =====
+def _job_export_excel(params, progress):
+    progress(0.1, 'Membaca data...')
+    df_vehicles = load_data(params['vehicle_file'])
+    df_services = load_services_with_archive(params['service_file'])
+    progress(0.4, 'Menulis file Excel...')
+    file_path = export_to_excel(df_vehicles, df_services)
+    if not file_path:
+        raise RuntimeError('Gagal export ke Excel')
+    return file_path
+
+def _job_bulk_qr(params, progress):
+    df_vehicles = load_data(params['vehicle_file'])
+    plates = df_vehicles['plat_nomor'].tolist() if not df_vehicles.empty else []
+    file_path = f"data/qr_semua_{datetime.now().strftime('%Y%m%d_%H%M%S')}.zip"
+
+    with zipfile.ZipFile(file_path, 'w', compression=zipfile.ZIP_DEFLATED) as zf:
+        for i, plat in enumerate(plates):
+            qr_path = generate_qr_code(plat)
+            if qr_path:
+                zf.write(qr_path, arcname=os.path.basename(qr_path))
+            if i % 20 == 0:
+                progress(i / len(plates), f"QR {i + 1} dari {len(plates)}")
+    return file_path
+
+def _job_import_odometer(params, progress):
+    progress(0.1, 'Memproses log odometer...')
+    success, message = ingest_odometer_readings(params['vehicle_file'], params['readings_file'])
+    if not success:
+        raise RuntimeError(message)
+    return message
+
+JOB_FUNCTIONS = {
+    'export_excel': _job_export_excel,
+    'bulk_qr': _job_bulk_qr,
+    'import_odometer': _job_import_odometer,
+}
+
+# ===== FUNGSI 32: GET SHARD PATHS =====
+def get_shard_paths(shard=None):
+    """
+    Menentukan path file data untuk satu cabang (shard)
+    Parameter:
+        - shard (string): nama cabang, None/'' untuk data pusat
+    Return: Tuple (vehicle_file, service_file)
+    """
+    if not shard:
+        return 'data/vehicles.csv', 'data/service_log.csv'
+
+    shard_dir = os.path.join(SHARD_ROOT, shard)
+    if not os.path.exists(shard_dir):
+        os.makedirs(shard_dir)
+    return os.path.join(shard_dir, 'vehicles.csv'), os.path.join(shard_dir, 'service_log.csv')
+
+def list_shards():
+    """
+    Daftar nama cabang yang sudah memiliki folder data
+    Return: List string
+    """
+    try:
+        if not os.path.exists(SHARD_ROOT):
+            return []
+        return sorted(
+            name for name in os.listdir(SHARD_ROOT)
+            if os.path.isdir(os.path.join(SHARD_ROOT, name))
+        )
+    except Exception as e:
+        print(f"Error listing shards: {e}")
+        return []
+
+def validate_shard_name(shard):
+    if not shard or not re.fullmatch(r'[A-Za-z0-9_-]{1,40}', shard):
+        return False, "Nama cabang hanya boleh huruf, angka, '-' dan '_' (maks. 40 karakter)!"
+    return True, "Data valid"
+
+# ===== FUNGSI 33: GET TOTAL STATS ALL SHARDS =====
+def get_total_stats_all_shards(shards):
+    """
+    Statistik gabungan beberapa cabang dengan menjumlahkan statistik per cabang
+    Parameter:
+        - shards (list): daftar nama cabang (None untuk data pusat)
+    Return: Dictionary statistik gabungan + 'per_cabang' (DataFrame)
+    """
+    keys = ['total_vehicles', 'total_services', 'total_cost', 'services_this_month']
+    combined = {key: 0 for key in keys}
+    rows = []
+    try:
+        for shard in shards:
+            vehicle_file, service_file = get_shard_paths(shard)
+            stats = get_total_stats(load_data(vehicle_file), load_data(service_file), service_file)
+            for key in keys:
+                combined[key] += stats[key]
+            rows.append({'cabang': shard or 'Pusat', **stats})
+    except Exception as e:
+        print(f"Error calculating shard stats: {e}")
+    combined['per_cabang'] = pd.DataFrame(rows, columns=['cabang'] + keys)
+    return combined
+
+# ===== FUNGSI 34: EXPORT ALL SHARDS TO EXCEL =====
+def export_all_shards_to_excel(shards):
+    """
+    Export data semua cabang ke satu file Excel dengan kolom 'cabang'
+    Parameter:
+        - shards (list): daftar nama cabang (None untuk data pusat)
+    Return: string (path file Excel) atau None
+    """
+    try:
+        file_name = f"laporan_semua_cabang_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
+        file_path = f"data/{file_name}"
+
+        vehicle_frames = []
+        service_frames = []
+        for shard in shards:
+            vehicle_file, service_file = get_shard_paths(shard)
+            vehicle_frames.append(load_data(vehicle_file).assign(cabang=shard or 'Pusat'))
+            service_frames.append(load_services_with_archive(service_file).assign(cabang=shard or 'Pusat'))
+
+        stats = get_total_stats_all_shards(shards)
+
+        with pd.ExcelWriter(file_path, engine='openpyxl') as writer:
+            pd.concat(vehicle_frames, ignore_index=True).to_excel(writer, sheet_name='Data Kendaraan', index=False)
+            pd.concat(service_frames, ignore_index=True).to_excel(writer, sheet_name='Riwayat Servis', index=False)
+
+            # Ringkasan dari gabungan statistik per cabang
+            summary_data = {
+                'Keterangan': [
+                    'Total Kendaraan',
+                    'Total Servis',
+                    'Total Biaya Servis',
+                    'Jumlah Cabang',
+                    'Tanggal Export'
+                ],
+                'Nilai': [
+                    stats['total_vehicles'],
+                    stats['total_services'],
+                    f"Rp {stats['total_cost']:,.0f}",
+                    len(shards),
+                    datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+                ]
+            }
+            pd.DataFrame(summary_data).to_excel(writer, sheet_name='Ringkasan', index=False)
+            stats['per_cabang'].to_excel(writer, sheet_name='Ringkasan Cabang', index=False)
+
+        return file_path
+    except Exception as e:
+        print(f"Error exporting all shards: {e}")
+        return None
+
+def _job_export_all_shards(params, progress):
+    progress(0.1, 'Mengumpulkan data semua cabang...')
+    file_path = export_all_shards_to_excel(params['shards'])
+    if not file_path:
+        raise RuntimeError('Gagal export semua cabang')
+    return file_path
+
+JOB_FUNCTIONS['export_semua_cabang'] = _job_export_all_shards
+
+# ===== FUNGSI 35: ARCHIVE OLD SERVICES =====
+ARCHIVE_MANIFEST_COLUMNS = ['segmen', 'plat_nomor', 'tanggal_awal', 'tanggal_akhir', 'jumlah', 'total_biaya']
+
+def get_archive_paths(service_file):
+    # Segmen arsip: <folder>/arsip/<nama>_<tahun>.csv.gz, daftar isi di manifest
+    archive_dir = os.path.join(os.path.dirname(service_file), 'arsip')
+    stem = os.path.splitext(os.path.basename(service_file))[0]
+    return archive_dir, os.path.join(archive_dir, f"{stem}_manifest.csv")
+
+def _read_archive_manifest(service_file):
+    _, manifest_path = get_archive_paths(service_file)
+    if not os.path.exists(manifest_path):
+        return pd.DataFrame(columns=ARCHIVE_MANIFEST_COLUMNS)
+    manifest = pd.read_csv(manifest_path, dtype={'segmen': str, 'plat_nomor': str, 'tanggal_awal': str, 'tanggal_akhir': str})
+    # Manifest lama belum punya total_biaya, dihitung dari segmen saat dibutuhkan
+    if 'total_biaya' not in manifest.columns:
+        manifest['total_biaya'] = np.nan
+    return manifest
+
+def _get_archive_id_path(service_file):
+    archive_dir, _ = get_archive_paths(service_file)
+    stem = os.path.splitext(os.path.basename(service_file))[0]
+    return os.path.join(archive_dir, f"{stem}_id_terakhir.txt")
+
+def _max_service_id_number(ids):
+    # Nomor tertinggi dari id_servis 'SRVnnn' (0 jika tidak ada yang valid)
+    numbers = pd.to_numeric(pd.Series(ids, dtype=object).astype(str).str.replace('SRV', '', regex=False), errors='coerce')
+    return int(numbers.max()) if numbers.notna().any() else 0
+
+def get_archived_id_max(service_file):
+    """
+    Nomor id_servis tertinggi yang pernah diarsipkan, agar id baru
+    tidak memakai ulang id yang sudah pindah ke arsip
+    Parameter: service_file (string)
+    Return: int (0 jika belum ada arsip)
+    """
+    id_path = _get_archive_id_path(service_file)
+    try:
+        if os.path.exists(id_path):
+            with open(id_path) as f:
+                return int(f.read().strip() or 0)
+
+        # Arsip lama tanpa penanda: pindai id di semua segmen sekali, lalu simpan
+        segments = list_archive_segments(service_file)
+        if not segments:
+            return 0
+        highest = max(_max_service_id_number(pd.read_csv(segmen, compression='gzip', usecols=['id_servis'])['id_servis']) for segmen in segments)
+        _write_archived_id_max(service_file, highest)
+        return highest
+    except Exception as e:
+        print(f"Error reading archived id: {e}")
+        return 0
+
+def _write_archived_id_max(service_file, number):
+    _write_id_mark(_get_archive_id_path(service_file), number)
+
+def _read_id_mark(id_path):
+    if not os.path.exists(id_path):
+        return None
+    with open(id_path) as f:
+        return int(f.read().strip() or 0)
+
+def _write_id_mark(id_path, number):
+    # Penanda hanya boleh naik; ditulis lewat file sementara
+    number = max(number, _read_id_mark(id_path) or 0)
+    with open(id_path + '.tmp', 'w') as f:
+        f.write(str(int(number)))
+    os.replace(id_path + '.tmp', id_path)
+
+def get_service_id_mark_path(service_file):
+    return os.path.splitext(service_file)[0] + '_id_terakhir.txt'
+
+def _last_service_number(service_file, df=None):
+    # Nomor id tertinggi yang sudah dipakai: penanda id, arsip, dan file aktif
+    # (df jika sudah dimuat; file besar dipindai per potongan hanya jika penanda belum ada)
+    mark = _read_id_mark(get_service_id_mark_path(service_file))
+    number = max(get_archived_id_max(service_file), mark or 0)
+    if df is not None:
+        if 'id_servis' in df.columns:
+            number = max(number, _max_service_id_number(df['id_servis']))
+    elif mark is None:
+        for chunk in iter_service_chunks(service_file, ['id_servis']):
+            number = max(number, _max_service_id_number(chunk['id_servis']))
+    return number
+
+def get_archive_totals(service_file):
+    """
+    Jumlah servis dan total biaya yang tersimpan di arsip (dari manifest)
+    Parameter: service_file (string)
+    Return: Dictionary {'total_services', 'total_cost'}
+    """
+    totals = {'total_services': 0, 'total_cost': 0}
+    try:
+        manifest = _read_archive_manifest(service_file)
+        if manifest.empty:
+            return totals
+        totals['total_services'] = int(manifest['jumlah'].sum())
+        totals['total_cost'] = float(pd.to_numeric(manifest['total_biaya'], errors='coerce').sum())
+
+        # Segmen dari manifest lama: biaya dijumlahkan langsung dari segmennya
+        archive_dir, _ = get_archive_paths(service_file)
+        for segmen in manifest.loc[manifest['total_biaya'].isna(), 'segmen'].unique():
+            biaya = pd.read_csv(os.path.join(archive_dir, segmen), compression='gzip', usecols=['biaya'])['biaya']
+            totals['total_cost'] += float(pd.to_numeric(biaya, errors='coerce').sum())
+        return totals
+    except Exception as e:
+        print(f"Error reading archive totals: {e}")
+        return totals
+
+def list_archive_segments(service_file):
+    """
+    Daftar path segmen arsip milik file servis
+    Parameter: service_file (string)
+    Return: List string
+    """
+    archive_dir, _ = get_archive_paths(service_file)
+    manifest = _read_archive_manifest(service_file)
+    return [os.path.join(archive_dir, segmen) for segmen in sorted(manifest['segmen'].unique())]
+
+def _write_archive_segment(segment_path, df_segment):
+    # Segmen ditulis ulang lewat file sementara lalu dikunci read-only
+    tmp_path = segment_path + '.tmp'
+    df_segment.to_csv(tmp_path, index=False, compression='gzip')
+    if os.path.exists(segment_path):
+        os.chmod(segment_path, 0o644)
+    os.replace(tmp_path, segment_path)
+    os.chmod(segment_path, 0o444)
+
+def _segment_manifest_rows(segmen, df_segment):
+    tanggal = pd.to_datetime(df_segment['tanggal'], errors='coerce').dt.strftime('%Y-%m-%d')
+    biaya = pd.to_numeric(df_segment['biaya'], errors='coerce')
+    rows = pd.DataFrame({'plat_nomor': df_segment['plat_nomor'], 'tanggal': tanggal, 'biaya': biaya}).groupby('plat_nomor', as_index=False).agg(
+        tanggal_awal=('tanggal', 'min'),
+        tanggal_akhir=('tanggal', 'max'),
+        jumlah=('tanggal', 'size'),
+        total_biaya=('biaya', 'sum')
+    )
+    rows['segmen'] = segmen
+    return rows[ARCHIVE_MANIFEST_COLUMNS]
+
+def _replace_manifest_segments(service_file, segment_frames):
+    # Ganti baris manifest untuk segmen yang baru ditulis ulang
+    _, manifest_path = get_archive_paths(service_file)
+    manifest = _read_archive_manifest(service_file)
+    manifest = manifest[~manifest['segmen'].isin(list(segment_frames.keys()))]
+    new_rows = [_segment_manifest_rows(segmen, df) for segmen, df in segment_frames.items() if not df.empty]
+    manifest = pd.concat([manifest] + new_rows, ignore_index=True)
+    manifest.to_csv(manifest_path, index=False)
+
+def archive_old_services(service_file, cutoff_date):
+    """
+    Memindahkan servis yang lebih lama dari cutoff ke segmen arsip
+    terkompresi (per tahun), sehingga file servis aktif tetap kecil
+    Parameter:
+        - service_file (string): path file CSV servis
+        - cutoff_date (string/date): servis sebelum tanggal ini diarsipkan
+    Return: Tuple (Boolean, pesan)
+    """
+    try:
+        # Append dari proses lain ditahan sampai file aktif selesai ditulis ulang
+        with file_lock(service_file):
+            df = load_data(service_file)
+            if df.empty:
+                return True, "Tidak ada data servis untuk diarsipkan"
+
+            tanggal = pd.to_datetime(df['tanggal'], errors='coerce')
+            is_old = (tanggal < pd.Timestamp(cutoff_date)).fillna(False).to_numpy(dtype=bool)
+            if not is_old.any():
+                return True, "Tidak ada servis yang lebih lama dari tanggal cutoff"
+
+            archive_dir, _ = get_archive_paths(service_file)
+            if not os.path.exists(archive_dir):
+                os.makedirs(archive_dir)
+            stem = os.path.splitext(os.path.basename(service_file))[0]
+
+            df_old = df[is_old]
+            segment_frames = {}
+            for tahun, df_year in df_old.groupby(tanggal[is_old].dt.year.to_numpy()):
+                segmen = f"{stem}_{int(tahun)}.csv.gz"
+                segment_path = os.path.join(archive_dir, segmen)
+                if os.path.exists(segment_path):
+                    existing = pd.read_csv(segment_path, compression='gzip')
+                    # Hanya baris yang persis sama yang dibuang; id kembar tidak menimpa baris arsip
+                    df_year = pd.concat([existing.astype(object), df_year.astype(object)], ignore_index=True)
+                    df_year = df_year.drop_duplicates()
+                _write_archive_segment(segment_path, df_year)
+                segment_frames[segmen] = df_year
+
+            _replace_manifest_segments(service_file, segment_frames)
+            # Simpan id tertinggi sebelum file aktif ditulis ulang, agar id tidak dipakai ulang
+            _write_archived_id_max(service_file, _max_service_id_number(df_old['id_servis']))
+            if not save_data(service_file, df[~is_old]):
+                return False, "Gagal menulis ulang file servis aktif"
+
+            # Isi rollup & ringkasan tidak berubah (arsip tetap dihitung), cukup tandai masih segar
+            for rollup_path in list(get_rollup_paths(service_file)) + [get_vehicle_summary_path(service_file)]:
+                if os.path.exists(rollup_path):
+                    os.utime(rollup_path)
+
+        return True, f"{int(is_old.sum())} servis dipindahkan ke {len(segment_frames)} segmen arsip"
+    except Exception as e:
+        print(f"Error archiving services: {e}")
+        return False, f"Error arsip: {str(e)}"
+
+# ===== FUNGSI 36: LOAD ARCHIVED SERVICES =====
+def load_archived_services(service_file, start_date=None, end_date=None, plat_nomor=None):
+    """
+    Membaca servis dari arsip, hanya segmen yang relevan menurut manifest
+    Parameter:
+        - service_file (string): path file CSV servis aktif
+        - start_date, end_date (string/date): rentang tanggal (opsional)
+        - plat_nomor (string): plat nomor (opsional)
+    Return: DataFrame pandas (kosong jika tidak ada segmen yang cocok)
+    """
+    try:
+        manifest = _read_archive_manifest(service_file)
+        if manifest.empty:
+            return pd.DataFrame()
+
+        start = pd.Timestamp(start_date).strftime('%Y-%m-%d') if start_date is not None else None
+        end = pd.Timestamp(end_date).strftime('%Y-%m-%d') if end_date is not None else None
+
+        relevant = manifest
+        if plat_nomor is not None:
+            relevant = relevant[relevant['plat_nomor'] == plat_nomor]
+        if start is not None:
+            relevant = relevant[relevant['tanggal_akhir'] >= start]
+        if end is not None:
+            relevant = relevant[relevant['tanggal_awal'] <= end]
+        if relevant.empty:
+            return pd.DataFrame()
+
+        archive_dir, _ = get_archive_paths(service_file)
+        frames = []
+        for segmen in sorted(relevant['segmen'].unique()):
+            df_segment = pd.read_csv(os.path.join(archive_dir, segmen), compression='gzip')
+            if plat_nomor is not None:
+                df_segment = df_segment[df_segment['plat_nomor'] == plat_nomor]
+            if start is not None or end is not None:
+                tanggal = pd.to_datetime(df_segment['tanggal'], errors='coerce')
+                mask = pd.Series(True, index=df_segment.index)
+                if start is not None:
+                    mask &= tanggal >= pd.Timestamp(start)
+                if end is not None:
+                    mask &= tanggal <= pd.Timestamp(end)
+                df_segment = df_segment[mask]
+            frames.append(df_segment)
+
+        return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+    except Exception as e:
+        print(f"Error loading archived services: {e}")
+        return pd.DataFrame()
+
+def load_services_with_archive(service_file):
+    """
+    Membaca seluruh riwayat servis: file aktif + semua segmen arsip
+    Parameter: service_file (string)
+    Return: DataFrame pandas
+    """
+    df = load_data(service_file)
+    df_archived = load_archived_services(service_file)
+    if df_archived.empty:
+        return df
+    return pd.concat([df_archived.astype(object), df.astype(object)], ignore_index=True)
+
+def remove_plate_from_archive(service_file, plat_nomor):
+    """
+    Menghapus riwayat satu plat dari segmen arsip (dipakai saat hapus kendaraan)
+    Parameter:
+        - service_file (string): path file CSV servis aktif
+        - plat_nomor (string): plat nomor
+    Return: DataFrame baris arsip yang dihapus
+    """
+    try:
+        with file_lock(service_file):
+            manifest = _read_archive_manifest(service_file)
+            segments = manifest.loc[manifest['plat_nomor'] == plat_nomor, 'segmen'].unique()
+            if len(segments) == 0:
+                return pd.DataFrame()
+
+            archive_dir, _ = get_archive_paths(service_file)
+            removed_frames = []
+            segment_frames = {}
+            for segmen in segments:
+                segment_path = os.path.join(archive_dir, segmen)
+                df_segment = pd.read_csv(segment_path, compression='gzip')
+                is_plate = df_segment['plat_nomor'] == plat_nomor
+                removed_frames.append(df_segment[is_plate])
+                segment_frames[segmen] = df_segment[~is_plate]
+                if segment_frames[segmen].empty:
+                    os.chmod(segment_path, 0o644)
+                    os.remove(segment_path)
+                else:
+                    _write_archive_segment(segment_path, segment_frames[segmen])
+
+            _replace_manifest_segments(service_file, segment_frames)
+            return pd.concat(removed_frames, ignore_index=True)
+    except Exception as e:
+        print(f"Error removing plate from archive: {e}")
+        return pd.DataFrame()
+
+def _job_archive_services(params, progress):
+    progress(0.1, 'Memindahkan servis lama ke arsip...')
+    success, message = archive_old_services(params['service_file'], params['cutoff_date'])
+    if not success:
+        raise RuntimeError(message)
+    return message
+
+JOB_FUNCTIONS['arsip_servis'] = _job_archive_services
+
+# ===== FUNGSI 37: GENERATE LABEL SHEETS =====
+# A4 pada 150 DPI (piksel) dan dalam satuan point PDF
+LABEL_PAGE_SIZE = (1240, 1754)
+LABEL_PAGE_POINTS = (595.28, 841.89)
+
+def _load_label_font(size):
+    try:
+        return ImageFont.truetype("DejaVuSans.ttf", size)
+    except OSError:
+        return ImageFont.load_default()
+
+def _render_label_qr(plat_nomor, size):
+    qr = qrcode.QRCode(
+        version=1,
+        error_correction=qrcode.constants.ERROR_CORRECT_L,
+        box_size=10,
+        border=2,
+    )
+    qr.add_data(plat_nomor)
+    qr.make(fit=True)
+    img = qr.make_image(fill_color="black", back_color="white").convert('L')
+    return img.resize((size, size), Image.NEAREST)
+
+def _iter_label_pages(df_vehicles, columns, rows, progress=None):
+    # Menghasilkan halaman satu per satu; QR satu halaman dibuat paralel
+    page_w, page_h = LABEL_PAGE_SIZE
+    margin = 60
+    cell_w = (page_w - 2 * margin) // columns
+    cell_h = (page_h - 2 * margin) // rows
+    qr_size = min(cell_w, cell_h) - 70
+    font_plat = _load_label_font(26)
+    font_info = _load_label_font(18)
+
+    per_page = columns * rows
+    total = len(df_vehicles)
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        for start in range(0, total, per_page):
+            records = df_vehicles.iloc[start:start + per_page][['plat_nomor', 'merk', 'model']].astype(str).to_dict('records')
+            qr_images = pool.map(_render_label_qr, [r['plat_nomor'] for r in records], [qr_size] * len(records))
+
+            page = Image.new('L', LABEL_PAGE_SIZE, 255)
+            draw = ImageDraw.Draw(page)
+            for i, (record, qr_img) in enumerate(zip(records, qr_images)):
+                x = margin + (i % columns) * cell_w
+                y = margin + (i // columns) * cell_h
+                draw.rectangle([x + 4, y + 4, x + cell_w - 4, y + cell_h - 4], outline=200)
+                page.paste(qr_img, (x + (cell_w - qr_size) // 2, y + 10))
+
+                # Keterangan di bawah QR: plat nomor lalu merk & model
+                caption_y = y + 10 + qr_size + 4
+                for text, font in [(record['plat_nomor'], font_plat), (f"{record['merk']} {record['model']}", font_info)]:
+                    text_w = draw.textlength(text, font=font)
+                    draw.text((x + (cell_w - text_w) / 2, caption_y), text, fill=0, font=font)
+                    caption_y += font.size + 4 if hasattr(font, 'size') else 16
+
+            if progress:
+                progress(min(start + per_page, total) / total, f"Label {min(start + per_page, total)} dari {total}")
+            yield page
+
+def _write_pdf_pages(pages, output_path):
+    # Penulis PDF sederhana: setiap halaman langsung ditulis lalu dibuang dari memori
+    with open(output_path, 'wb') as f:
+        offsets = {}
+
+        def write_object(number, body, stream=None):
+            offsets[number] = f.tell()
+            f.write(f"{number} 0 obj\n".encode() + body)
+            if stream is not None:
+                f.write(b"\nstream\n" + stream + b"\nendstream")
+            f.write(b"\nendobj\n")
+
+        f.write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+        page_numbers = []
+        next_number = 3  # 1 = Catalog, 2 = Pages (ditulis di akhir)
+        page_w, page_h = LABEL_PAGE_POINTS
+
+        for page in pages:
+            image_number, content_number, page_number = next_number, next_number + 1, next_number + 2
+            next_number += 3
+
+            image_data = zlib.compress(page.tobytes())
+            write_object(image_number, (
+                f"<< /Type /XObject /Subtype /Image /Width {page.width} /Height {page.height} "
+                f"/ColorSpace /DeviceGray /BitsPerComponent 8 /Filter /FlateDecode /Length {len(image_data)} >>"
+            ).encode(), image_data)
+
+            content = f"q {page_w} 0 0 {page_h} 0 0 cm /Im0 Do Q".encode()
+            write_object(content_number, f"<< /Length {len(content)} >>".encode(), content)
+
+            write_object(page_number, (
+                f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {page_w} {page_h}] "
+                f"/Resources << /XObject << /Im0 {image_number} 0 R >> >> /Contents {content_number} 0 R >>"
+            ).encode())
+            page_numbers.append(page_number)
+
+        write_object(1, b"<< /Type /Catalog /Pages 2 0 R >>")
+        kids = ' '.join(f"{number} 0 R" for number in page_numbers)
+        write_object(2, f"<< /Type /Pages /Kids [{kids}] /Count {len(page_numbers)} >>".encode())
+
+        xref_position = f.tell()
+        f.write(f"xref\n0 {next_number}\n".encode())
+        f.write(b"0000000000 65535 f \n")
+        for number in range(1, next_number):
+            f.write(f"{offsets[number]:010d} 00000 n \n".encode())
+        f.write(f"trailer\n<< /Size {next_number} /Root 1 0 R >>\nstartxref\n{xref_position}\n%%EOF\n".encode())
+    return len(page_numbers)
+
+def generate_label_sheets(df_vehicles, file_format='pdf', columns=3, rows=7, progress=None):
+    """
+    Membuat lembar label QR (plat, merk, model) ukuran A4 untuk dicetak.
+    Halaman dibuat dan ditulis satu per satu sehingga memori tidak
+    bertambah dengan jumlah kendaraan.
+    Parameter:
+        - df_vehicles (DataFrame): kendaraan yang akan dicetak (hasil cari/filter)
+        - file_format (string): 'pdf' atau 'png' (ZIP berisi PNG per halaman)
+        - columns, rows (int): jumlah label per baris dan per kolom
+        - progress (function): callback progres opsional
+    Return: string (path file) atau None
+    """
+    try:
+        if df_vehicles.empty:
+            return None
+
+        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        pages = _iter_label_pages(df_vehicles, columns, rows, progress)
+
+        if file_format == 'pdf':
+            file_path = f"data/label_qr_{timestamp}.pdf"
+            _write_pdf_pages(pages, file_path)
+        elif file_format == 'png':
+            file_path = f"data/label_qr_{timestamp}.zip"
+            with zipfile.ZipFile(file_path, 'w', compression=zipfile.ZIP_DEFLATED) as zf:
+                for i, page in enumerate(pages, start=1):
+                    buffer = io.BytesIO()
+                    page.save(buffer, format='PNG', dpi=(150, 150))
+                    zf.writestr(f"label_qr_{i:04d}.png", buffer.getvalue())
+        else:
+            print(f"Format label tidak dikenal: {file_format}")
+            return None
+
+        return file_path
+    except Exception as e:
+        print(f"Error generating label sheets: {e}")
+        return None
+
+def _job_label_sheets(params, progress):
+    df_vehicles = search_vehicle(load_data(params['vehicle_file']), params.get('search_term', ''))
+    file_path = generate_label_sheets(df_vehicles, params.get('file_format', 'pdf'), progress=progress)
+    if not file_path:
+        raise RuntimeError('Tidak ada kendaraan untuk dicetak')
+    return file_path
+
+JOB_FUNCTIONS['label_qr'] = _job_label_sheets
+
+# ===== FUNGSI 38: PLATE INDEX (BK-TREE) =====
+def normalize_plate(plat_nomor):
+    # "b 1234-xyz" -> "B1234XYZ"
+    return re.sub(r'[^A-Z0-9]', '', str(plat_nomor).upper())
+
+def _plate_pattern(key):
+    # Bitmask posisi tiap karakter, dipakai ulang untuk banyak perbandingan
+    positions = {}
+    for i, char in enumerate(key):
+        positions[char] = positions.get(char, 0) | (1 << i)
+    return positions, len(key)
+
+def _edit_distance(pattern, text):
+    # Jarak Levenshtein bit-paralel (Myers/Hyyro), cepat untuk string pendek
+    positions, length = pattern
+    if length == 0:
+        return len(text)
+    full = (1 << length) - 1
+    high = 1 << (length - 1)
+    pv, mv, score = full, 0, length
+    for char in text:
+        eq = positions.get(char, 0)
+        xv = eq | mv
+        xh = (((eq & pv) + pv) ^ pv) | eq
+        ph = mv | ~(xh | pv)
+        mh = pv & xh
+        if ph & high:
+            score += 1
+        elif mh & high:
+            score -= 1
+        ph = (ph << 1) | 1
+        mh = mh << 1
+        pv = (mh | ~(xv | ph)) & full
+        mv = ph & xv & full
+    return score
+
+def _bk_insert(tree, plat_nomor):
+    # Node BK-tree: [kunci_normal, [plat asli], {jarak: node anak}]
+    key = normalize_plate(plat_nomor)
+    if tree is None:
+        return [key, [plat_nomor], {}]
+    pattern = _plate_pattern(key)
+    node = tree
+    while True:
+        distance = _edit_distance(pattern, node[0])
+        if distance == 0:
+            if plat_nomor not in node[1]:
+                node[1].append(plat_nomor)
+            return tree
+        child = node[2].get(distance)
+        if child is None:
+            node[2][distance] = [key, [plat_nomor], {}]
+            return tree
+        node = child
+
+def _bk_search(tree, query, max_distance):
+    results = []
+    pattern = _plate_pattern(query)
+    stack = [tree] if tree is not None else []
+    while stack:
+        node = stack.pop()
+        distance = _edit_distance(pattern, node[0])
+        if distance <= max_distance:
+            results.extend((distance, plat) for plat in node[1])
+        # Hanya anak dalam rentang |d - max| .. d + max yang mungkin cocok
+        for child_distance, child in node[2].items():
+            if distance - max_distance <= child_distance <= distance + max_distance:
+                stack.append(child)
+    return results
+
+def _file_key(file_path):
+    stat = os.stat(file_path)
+    return (stat.st_mtime_ns, stat.st_size)
+
+def build_plate_index(vehicle_file):
+    """
+    Membangun indeks BK-tree dari semua plat nomor di file kendaraan
+    Parameter: vehicle_file (string)
+    Return: Dictionary indeks
+    """
+    df = load_data(vehicle_file)
+    tree = None
+    plates = df['plat_nomor'].dropna().astype(str).tolist() if not df.empty else []
+    for plat in plates:
+        tree = _bk_insert(tree, plat)
+    index = {
+        'tree': tree,
+        'dihapus': set(),
+        'jumlah': len(plates),
+        'kunci_file': _file_key(vehicle_file) if os.path.exists(vehicle_file) else None
+    }
+    with _PLATE_INDEX_LOCK:
+        _PLATE_INDEX[vehicle_file] = index
+    return index
+
+def _get_plate_index(vehicle_file):
+    # Bangun ulang jika file kendaraan diubah di luar fungsi yang merawat indeks
+    index = _PLATE_INDEX.get(vehicle_file)
+    current_key = _file_key(vehicle_file) if os.path.exists(vehicle_file) else None
+    if index is None or index['kunci_file'] != current_key:
+        index = build_plate_index(vehicle_file)
+    return index
+
+def index_plate(vehicle_file, plat_nomor):
+    # Dipanggil setelah kendaraan ditambahkan
+    with _PLATE_INDEX_LOCK:
+        index = _PLATE_INDEX.get(vehicle_file)
+        if index is None:
+            return
+        index['tree'] = _bk_insert(index['tree'], plat_nomor)
+        index['dihapus'].discard(plat_nomor)
+        index['jumlah'] += 1
+        index['kunci_file'] = _file_key(vehicle_file)
+
+def unindex_plate(vehicle_file, plat_nomor):
+    # BK-tree tidak mendukung hapus node, jadi plat ditandai terhapus;
+    # indeks dibangun ulang jika tanda hapus sudah lebih dari separuh
+    with _PLATE_INDEX_LOCK:
+        index = _PLATE_INDEX.get(vehicle_file)
+        if index is None:
+            return
+        index['dihapus'].add(plat_nomor)
+        index['kunci_file'] = _file_key(vehicle_file)
+        rebuild = len(index['dihapus']) * 2 > index['jumlah']
+    if rebuild:
+        build_plate_index(vehicle_file)
+
+def touch_plate_index(vehicle_file):
+    # File kendaraan disimpan ulang tanpa mengubah daftar plat
+    with _PLATE_INDEX_LOCK:
+        index = _PLATE_INDEX.get(vehicle_file)
+        if index is not None:
+            index['kunci_file'] = _file_key(vehicle_file)
+
+# ===== FUNGSI 39: SUGGEST PLATES =====
+def suggest_plates(vehicle_file, query, max_distance=2, limit=5):
+    """
+    Mencari plat nomor terdaftar yang paling mirip (jarak edit terkecil)
+    Parameter:
+        - vehicle_file (string): path file kendaraan
+        - query (string): plat nomor hasil scan / ketikan
+        - max_distance (int): jarak edit maksimum
+        - limit (int): jumlah saran maksimum
+    Return: List plat nomor, urut dari yang paling mirip
+    """
+    try:
+        key = normalize_plate(query)
+        if not key:
+            return []
+        index = _get_plate_index(vehicle_file)
+        
+        # Perbesar radius bertahap; radius kecil memangkas jauh lebih banyak node
+        for radius in range(max_distance + 1):
+            matches = [
+                (distance, plat) for distance, plat in _bk_search(index['tree'], key, radius)
+                if plat not in index['dihapus']
+            ]
+            if matches:
+                matches.sort()
+                return [plat for _, plat in matches[:limit]]
+        return []
+    except Exception as e:
+        print(f"Error suggesting plates: {e}")
+        return []
+
+# ===== FUNGSI 40: BULK UPDATE VEHICLES =====
+def bulk_update_vehicles(file_path, updates):
+    """
+    Mengupdate banyak kendaraan sekaligus dalam satu kali proses & simpan
+    Parameter:
+        - file_path (string): path file CSV kendaraan
+        - updates (dict / DataFrame): {plat_nomor: {kolom: nilai}} atau
+          DataFrame dengan kolom plat_nomor + kolom yang diubah
+          (nilai kosong/NaN berarti kolom tersebut tidak diubah)
+    Return: Boolean (True jika sukses)
+    """
+    try:
+        if isinstance(updates, pd.DataFrame):
+            patches = updates.set_index('plat_nomor')
+        else:
+            patches = pd.DataFrame.from_dict(updates, orient='index')
+        if patches.empty:
+            return True
+        patches = patches[~patches.index.duplicated(keep='last')]
+        patches = patches.drop(columns=['plat_nomor'], errors='ignore')
+
+        # Baca-ubah-tulis dikunci agar update dari app dan api.py tidak saling menimpa
+        with file_lock(file_path):
+            df = load_data(file_path)
+            if df.empty:
+                return True
+
+            # Baris yang terkena patch ditentukan sekali untuk semua kolom
+            plat = df['plat_nomor'].astype(object)
+            row_mask = plat.isin(patches.index).to_numpy()
+            if not row_mask.any():
+                return True
+            row_positions = np.flatnonzero(row_mask)
+            row_plates = plat[row_mask]
+
+            for column in patches.columns:
+                new_values = row_plates.map(patches[column])
+                has_value = new_values.notna().to_numpy()
+                if not has_value.any():
+                    continue
+                if column not in df.columns:
+                    df[column] = None
+                column_values = df[column].astype(object).to_numpy(copy=True)
+                column_values[row_positions[has_value]] = new_values.to_numpy(dtype=object)[has_value]
+                df[column] = pd.Series(column_values, index=df.index).infer_objects()
+
+            if not save_data(file_path, df):
+                return False
+
+            changed = patches[patches.index.isin(row_plates)]
+            log_changes(file_path, 'ubah', 'kendaraan', [
+                (plat_nomor, {key: value for key, value in changes.items() if pd.notna(value)})
+                for plat_nomor, changes in changed.to_dict('index').items()
+            ])
+        touch_plate_index(file_path)
+        return True
+    except Exception as e:
+        print(f"Error bulk updating vehicles: {e}")
+        return False
+
+# ===== FUNGSI 41: STREAMING AGGREGATION =====
+def is_large_file(file_path, threshold=STREAMING_THRESHOLD_BYTES):
+    # File di atas threshold diproses per potongan, bukan dimuat sekaligus
+    return os.path.exists(file_path) and os.path.getsize(file_path) > threshold
+
+def iter_service_chunks(service_file, columns=None, chunksize=SERVICE_CHUNKSIZE):
+    """
+    Membaca file servis per potongan, hanya kolom yang dibutuhkan
+    Parameter:
+        - service_file (string): path file CSV servis
+        - columns (list): kolom yang dibaca (None = semua)
+        - chunksize (int): jumlah baris per potongan
+    Return: generator DataFrame
+    """
+    if not os.path.exists(service_file):
+        return
+    for chunk in pd.read_csv(service_file, usecols=columns, chunksize=chunksize):
+        yield chunk
+
+def get_total_stats_streaming(vehicle_file, service_file, chunksize=SERVICE_CHUNKSIZE):
+    """
+    Sama seperti get_total_stats, tetapi membaca file per potongan
+    sehingga memori dibatasi ukuran potongan, bukan ukuran file
+    Return: Dictionary statistik
+    """
+    stats = {
+        'total_vehicles': 0,
+        'total_services': 0,
+        'total_cost': 0,
+        'services_this_month': 0
+    }
+    try:
+        for chunk in iter_service_chunks(vehicle_file, ['plat_nomor'], chunksize):
+            stats['total_vehicles'] += len(chunk)
+
+        month_start = pd.Timestamp(datetime.now()).normalize().replace(day=1)
+        next_month = month_start + pd.offsets.MonthBegin(1)
+        for chunk in iter_service_chunks(service_file, ['tanggal', 'biaya'], chunksize):
+            tanggal = pd.to_datetime(chunk['tanggal'], errors='coerce')
+            stats['total_services'] += len(chunk)
+            stats['total_cost'] += pd.to_numeric(chunk['biaya'], errors='coerce').sum()
+            stats['services_this_month'] += int(((tanggal >= month_start) & (tanggal < next_month)).sum())
+
+        # Servis di arsip ikut dihitung agar sama dengan mode biasa dan laporan
+        archived = get_archive_totals(service_file)
+        stats['total_services'] += archived['total_services']
+        stats['total_cost'] += archived['total_cost']
+        return stats
+    except Exception as e:
+        print(f"Error calculating streaming stats: {e}")
+        return stats
+
+def aggregate_services_streaming(service_file, start_date=None, end_date=None, chunksize=SERVICE_CHUNKSIZE):
+    """
+    Agregasi untuk grafik (jumlah servis per plat & biaya per jenis servis)
+    dengan menggabungkan hasil parsial tiap potongan
+    Parameter:
+        - service_file (string): path file CSV servis
+        - start_date, end_date (string/date): rentang tanggal opsional
+        - chunksize (int): jumlah baris per potongan
+    Return: Tuple (Series jumlah per plat, DataFrame [jenis_servis, biaya])
+    """
+    counts = pd.Series(dtype='int64')
+    costs = pd.Series(dtype=float)
+    try:
+        columns = ['plat_nomor', 'tanggal', 'jenis_servis', 'biaya']
+        for chunk in iter_service_chunks(service_file, columns, chunksize):
+            chunk = _filter_chunk_by_date(chunk, start_date, end_date)
+            counts = counts.add(chunk['plat_nomor'].value_counts(), fill_value=0)
+            chunk_costs = pd.to_numeric(chunk['biaya'], errors='coerce').groupby(chunk['jenis_servis']).sum()
+            costs = costs.add(chunk_costs, fill_value=0)
+    except Exception as e:
+        print(f"Error aggregating services: {e}")
+
+    cost_by_type = costs.rename('biaya').rename_axis('jenis_servis').reset_index()
+    return counts.astype('int64'), cost_by_type
+
+def _filter_chunk_by_date(chunk, start_date, end_date):
+    if start_date is None and end_date is None:
+        return chunk
+    tanggal = pd.to_datetime(chunk['tanggal'], errors='coerce')
+    mask = pd.Series(True, index=chunk.index)
+    if start_date is not None:
+        mask &= tanggal >= pd.to_datetime(start_date)
+    if end_date is not None:
+        mask &= tanggal <= pd.to_datetime(end_date)
+    return chunk[mask]
+
+def filter_by_date_streaming(service_file, start_date, end_date, max_rows=None, chunksize=SERVICE_CHUNKSIZE):
+    """
+    Filter tanggal langsung dari file per potongan
+    Parameter:
+        - service_file (string): path file CSV servis
+        - start_date, end_date (string/date): rentang tanggal (inklusif)
+        - max_rows (int): batas jumlah baris hasil (None = tanpa batas)
+        - chunksize (int): jumlah baris per potongan
+    Return: DataFrame pandas
+    """
+    frames = []
+    total = 0
+    try:
+        for chunk in iter_service_chunks(service_file, None, chunksize):
+            filtered = _filter_chunk_by_date(chunk, start_date, end_date)
+            if max_rows is not None:
+                filtered = filtered.head(max_rows - total)
+            frames.append(filtered)
+            total += len(filtered)
+            if max_rows is not None and total >= max_rows:
+                break
+        return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+    except Exception as e:
+        print(f"Error filtering by date (streaming): {e}")
+        return pd.DataFrame()
+
+def get_recent_services_streaming(service_file, n=5, chunksize=SERVICE_CHUNKSIZE):
+    # n servis terbaru: ambil n teratas per potongan lalu gabungkan
+    recent = pd.DataFrame()
+    try:
+        for chunk in iter_service_chunks(service_file, None, chunksize):
+            recent = pd.concat([recent, chunk], ignore_index=True)
+            recent = recent.sort_values('tanggal', ascending=False).head(n)
+        return recent
+    except Exception as e:
+        print(f"Error getting recent services: {e}")
+        return recent
+
+def get_last_services_streaming(service_file, chunksize=SERVICE_CHUNKSIZE):
+    # Servis terakhir per (plat, jenis servis), bisa langsung dipakai compute_maintenance_due
+    columns = ['plat_nomor', 'jenis_servis', 'tanggal', 'km_saat_servis']
+    last = pd.DataFrame(columns=columns)
+    try:
+        for chunk in iter_service_chunks(service_file, columns, chunksize):
+            chunk = chunk.assign(
+                tanggal=pd.to_datetime(chunk['tanggal'], errors='coerce'),
+                km_saat_servis=pd.to_numeric(chunk['km_saat_servis'], errors='coerce')
+            )
+            last = pd.concat([last, chunk], ignore_index=True).groupby(
+                ['plat_nomor', 'jenis_servis'], as_index=False
+            ).agg(tanggal=('tanggal', 'max'), km_saat_servis=('km_saat_servis', 'max'))
+        return last
+    except Exception as e:
+        print(f"Error getting last services: {e}")
+        return last
+
+# ===== FUNGSI 42: BUILD SERVICE INDEX =====
+def get_service_index_path(service_file):
+    return os.path.splitext(service_file)[0] + '_offset.idx'
+
+def _index_header(file_key):
+    # Header lebar tetap agar bisa ditimpa di tempat saat indeks diperpanjang
+    return f"{file_key[0]:020d} {file_key[1]:020d}\n".encode()
+
+def _iter_csv_records(f, start):
+    # Pecah file CSV (mode biner) menjadi record beserta offset byte-nya;
+    # baris dengan jumlah tanda kutip ganjil berarti field berisi enter
+    pos = start
+    record_start = start
+    parts = []
+    quotes = 0
+    for line in f:
+        parts.append(line)
+        quotes += line.count(b'"')
+        pos += len(line)
+        if quotes % 2 == 0:
+            yield record_start, b''.join(parts)
+            parts = []
+            quotes = 0
+            record_start = pos
+    if parts:
+        yield record_start, b''.join(parts)
+
+def _record_field(record, position):
+    if b'"' in record:
+        return next(csv.reader(io.StringIO(record.decode('utf-8'))))[position]
+    return record.rstrip(b'\r\n').split(b',')[position].decode('utf-8')
+
+def _scan_plate_offsets(service_file, start=None):
+    # Daftar (plat, offset, panjang) untuk setiap record mulai dari posisi start
+    entries = []
+    with open(service_file, 'rb') as f:
+        header = f.readline()
+        plat_pos = next(csv.reader(io.StringIO(header.decode('utf-8')))).index('plat_nomor')
+        start = len(header) if start is None else max(start, len(header))
+        f.seek(start)
+        for offset, record in _iter_csv_records(f, start):
+            if record.strip():
+                entries.append((_record_field(record, plat_pos), offset, len(record)))
+    return entries
+
+def build_service_index(service_file):
+    """
+    Membangun indeks sidecar plat nomor -> offset byte baris servis,
+    sehingga riwayat satu kendaraan bisa dibaca tanpa parse seluruh file
+    Parameter: service_file (string)
+    Return: Dictionary {plat_nomor: [(offset, panjang), ...]}
+    """
+    with _SERVICE_INDEX_LOCK:
+        file_key = _file_key(service_file)
+        entries = _scan_plate_offsets(service_file)
+        offsets = {}
+        for plat, offset, length in entries:
+            offsets.setdefault(plat, []).append((offset, length))
+
+        index_path = get_service_index_path(service_file)
+        tmp_path = f"{index_path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as idx:
+            idx.write(_index_header(file_key))
+            idx.write(''.join(f"{plat}\t{offset}\t{length}\n" for plat, offset, length in entries).encode('utf-8'))
+        os.replace(tmp_path, index_path)
+
+        _SERVICE_INDEX[service_file] = (file_key, offsets)
+        return offsets
+
+def extend_service_index(service_file, previous_key):
+    """
+    Menambahkan offset baris yang baru di-append ke indeks sidecar
+    Parameter:
+        - service_file (string): path file CSV servis
+        - previous_key (tuple): _file_key file servis sebelum append
+    Return: Boolean (False jika indeks tidak ada / sudah basi, akan dibangun ulang saat dibaca)
+    """
+    try:
+        index_path = get_service_index_path(service_file)
+        if not os.path.exists(index_path):
+            return False
+        with _SERVICE_INDEX_LOCK:
+            with open(index_path, 'r+b') as idx:
+                if idx.readline() != _index_header(previous_key):
+                    return False
+                file_key = _file_key(service_file)
+                entries = _scan_plate_offsets(service_file, previous_key[1])
+                idx.seek(0, os.SEEK_END)
+                idx.write(''.join(f"{plat}\t{offset}\t{length}\n" for plat, offset, length in entries).encode('utf-8'))
+                idx.seek(0)
+                idx.write(_index_header(file_key))
+
+            cached = _SERVICE_INDEX.get(service_file)
+            if cached is not None and cached[0] == previous_key:
+                for plat, offset, length in entries:
+                    cached[1].setdefault(plat, []).append((offset, length))
+                _SERVICE_INDEX[service_file] = (file_key, cached[1])
+        return True
+    except Exception as e:
+        print(f"Error extending service index: {e}")
+        return False
+
+def _get_service_index(service_file):
+    # Pakai cache / file indeks jika masih sesuai ukuran & waktu ubah file servis
+    file_key = _file_key(service_file)
+    cached = _SERVICE_INDEX.get(service_file)
+    if cached is not None and cached[0] == file_key:
+        return cached[1]
+
+    index_path = get_service_index_path(service_file)
+    if os.path.exists(index_path):
+        with open(index_path, 'rb') as idx:
+            if idx.readline() == _index_header(file_key):
+                offsets = {}
+                for line in idx:
+                    plat, offset, length = line.decode('utf-8').rstrip('\n').split('\t')
+                    offsets.setdefault(plat, []).append((int(offset), int(length)))
+                _SERVICE_INDEX[service_file] = (file_key, offsets)
+                return offsets
+    return build_service_index(service_file)
+
+# ===== FUNGSI 43: READ PLATE SERVICES =====
+def read_plate_services(service_file, plat_nomor):
+    """
+    Membaca baris servis satu / beberapa plat dengan seek ke offset dari indeks sidecar
+    Parameter:
+        - service_file (string): path file CSV servis
+        - plat_nomor (string / list): plat nomor kendaraan
+    Return: DataFrame pandas, atau None jika indeks tidak bisa dipakai
+    """
+    try:
+        index = _get_service_index(service_file)
+        plates = [plat_nomor] if isinstance(plat_nomor, str) else list(plat_nomor)
+        offsets = sorted(offset for plat in plates for offset in index.get(str(plat), []))
+        with open(service_file, 'rb') as f:
+            chunks = [f.readline()]
+            for offset, length in offsets:
+                f.seek(offset)
+                record = f.read(length)
+                chunks.append(record if record.endswith(b'\n') else record + b'\n')
+        return pd.read_csv(io.BytesIO(b''.join(chunks)))
+    except Exception as e:
+        print(f"Error reading plate services: {e}")
+        return None
+
+# ===== FUNGSI 44: CHECK DATA INTEGRITY =====
+INTEGRITY_ISSUES = ['plat_tidak_terdaftar', 'baris_duplikat', 'id_duplikat', 'tanggal_tidak_valid', 'km_mundur']
+INTEGRITY_FINDING_COLUMNS = ['baris', 'id_servis', 'plat_nomor', 'masalah', 'detail']
+
+# Partisi sementara di disk: baris dibagi per hash (id_servis untuk duplikat, plat untuk
+# km) sehingga setiap partisi diproses sendiri dan memori mengikuti ukuran partisi
+INTEGRITY_MIN_ROW_BYTES = 40  # perkiraan minimal byte per baris CSV servis
+INTEGRITY_MAX_PARTITIONS = 1024
+_DUPLICATE_RECORD = np.dtype([('baris', '<i8'), ('baris_hash', '<u8'), ('id_hash', '<u8')])
+_KM_RECORD = np.dtype([('baris', '<i8'), ('plat', '<u8'), ('hari', '<i8'), ('km', '<f8')])
+
+def _append_partitions(tmp_dir, prefix, records, keys, n_parts):
+    # Tambahkan record ke file partisi <prefix>_<n>.bin (urutan baris tetap terjaga)
+    part_ids = (keys % np.uint64(n_parts)).astype(np.int64)
+    order = np.argsort(part_ids, kind='stable')
+    bounds = np.searchsorted(part_ids[order], np.arange(n_parts + 1))
+    for part in range(n_parts):
+        if bounds[part] < bounds[part + 1]:
+            with open(os.path.join(tmp_dir, f"{prefix}_{part}.bin"), 'ab') as f:
+                records[order[bounds[part]:bounds[part + 1]]].tofile(f)
+
+def _partition_integrity_records(service_file, tmp_dir, n_parts, chunksize):
+    # Pass pertama: tulis hash baris/id dan (plat, tanggal, km) ke partisi di disk
+    for chunk in iter_service_chunks(service_file, None, chunksize):
+        baris = chunk.index.to_numpy(dtype=np.int64)
+        id_hashes = pd.util.hash_array(chunk['id_servis'].astype(str).to_numpy(dtype=object))
+        duplicates = np.empty(len(chunk), dtype=_DUPLICATE_RECORD)
+        duplicates['baris'] = baris
+        duplicates['baris_hash'] = pd.util.hash_pandas_object(chunk.astype(str), index=False).to_numpy()
+        duplicates['id_hash'] = id_hashes
+        # Baris yang identik pasti ber-id sama, jadi keduanya dicek di partisi id yang sama
+        _append_partitions(tmp_dir, 'duplikat', duplicates, id_hashes, n_parts)
+
+        tanggal = pd.to_datetime(chunk['tanggal'], errors='coerce', format='ISO8601')
+        km = pd.to_numeric(chunk['km_saat_servis'], errors='coerce').to_numpy(dtype=float)
+        valid = tanggal.notna().to_numpy() & ~np.isnan(km)
+        plate_hashes = pd.util.hash_array(chunk['plat_nomor'].astype(str).to_numpy(dtype=object))
+        readings = np.empty(int(valid.sum()), dtype=_KM_RECORD)
+        readings['baris'] = baris[valid]
+        readings['plat'] = plate_hashes[valid]
+        readings['hari'] = tanggal.to_numpy()[valid].astype('datetime64[D]').astype(np.int64)
+        readings['km'] = km[valid]
+        _append_partitions(tmp_dir, 'km', readings, plate_hashes[valid], n_parts)
+
+def _scan_integrity_partitions(tmp_dir, n_parts):
+    # Proses per partisi; hasilnya hanya nomor baris yang bermasalah (terurut)
+    row_duplicates, id_duplicates, km_rows, km_previous = [], [], [], []
+    for part in range(n_parts):
+        path = os.path.join(tmp_dir, f"duplikat_{part}.bin")
+        if os.path.exists(path):
+            records = np.fromfile(path, dtype=_DUPLICATE_RECORD)
+            row_dup = pd.Series(records['baris_hash']).duplicated().to_numpy()
+            id_dup = pd.Series(records['id_hash']).duplicated().to_numpy() & ~row_dup
+            row_duplicates.append(records['baris'][row_dup])
+            id_duplicates.append(records['baris'][id_dup])
+
+        path = os.path.join(tmp_dir, f"km_{part}.bin")
+        if os.path.exists(path):
+            readings = pd.DataFrame(np.fromfile(path, dtype=_KM_RECORD))
+            # km tertinggi per plat dari servis bertanggal lebih awal (urut tanggal, bukan posisi
+            # di file); servis di tanggal yang sama tidak dianggap berurutan
+            per_day = readings.groupby(['plat', 'hari'], as_index=False)['km'].max().sort_values(['plat', 'hari'])
+            per_day['km_sebelumnya'] = per_day.groupby('plat')['km'].cummax().groupby(per_day['plat']).shift()
+            previous = readings.merge(per_day[['plat', 'hari', 'km_sebelumnya']], on=['plat', 'hari'], how='left')
+            backwards = (previous['km'] < previous['km_sebelumnya']).to_numpy()
+            km_rows.append(previous['baris'].to_numpy()[backwards])
+            km_previous.append(previous['km_sebelumnya'].to_numpy()[backwards])
+
+    def _sorted(parts, dtype):
+        return np.sort(np.concatenate(parts)) if parts else np.empty(0, dtype=dtype)
+
+    km_rows = np.concatenate(km_rows) if km_rows else np.empty(0, dtype=np.int64)
+    km_previous = np.concatenate(km_previous) if km_previous else np.empty(0, dtype=float)
+    order = np.argsort(km_rows)
+    return _sorted(row_duplicates, np.int64), _sorted(id_duplicates, np.int64), km_rows[order], km_previous[order]
+
+def _iter_integrity_flags(vehicle_file, service_file, chunksize=SERVICE_CHUNKSIZE):
+    # Generator (chunk, flags, detail) dalam urutan file. Duplikat & km mundur dihitung
+    # lebih dulu lewat partisi di disk (memori ~ ukuran partisi + jumlah baris bermasalah,
+    # bukan ukuran file), lalu ditempel ke tiap potongan di pass kedua
+    df_vehicles = load_data(vehicle_file)
+    known_plates = pd.Index(df_vehicles['plat_nomor'].dropna().astype(str).unique() if not df_vehicles.empty else [])
+
+    file_size = os.path.getsize(service_file) if os.path.exists(service_file) else 0
+    n_parts = int(min(INTEGRITY_MAX_PARTITIONS, max(1, -(-file_size // (chunksize * INTEGRITY_MIN_ROW_BYTES)))))
+    with tempfile.TemporaryDirectory(prefix='integritas_') as tmp_dir:
+        _partition_integrity_records(service_file, tmp_dir, n_parts, chunksize)
+        row_duplicates, id_duplicates, km_rows, km_previous = _scan_integrity_partitions(tmp_dir, n_parts)
+
+    for chunk in iter_service_chunks(service_file, None, chunksize):
+        baris = chunk.index.to_numpy(dtype=np.int64)
+        flags = pd.DataFrame(index=chunk.index)
+        flags['plat_tidak_terdaftar'] = ~chunk['plat_nomor'].isin(known_plates)
+        flags['baris_duplikat'] = np.isin(baris, row_duplicates)
+        flags['id_duplikat'] = np.isin(baris, id_duplicates)
+
+        tanggal = pd.to_datetime(chunk['tanggal'], errors='coerce', format='ISO8601')
+        flags['tanggal_tidak_valid'] = tanggal.isna().to_numpy()
+
+        # km mundur: km di bawah km tertinggi dari servis plat yang sama di tanggal lebih awal
+        mask = np.isin(baris, km_rows)
+        flags['km_mundur'] = mask
+
+        # Kolom detail dibangun sebagai array object (aman untuk dtype string pandas)
+        detail = np.full(len(chunk), '', dtype=object)
+        if mask.any():
+            km = pd.to_numeric(chunk['km_saat_servis'], errors='coerce').to_numpy(dtype=float)[mask]
+            previous = km_previous[np.searchsorted(km_rows, baris[mask])]
+            detail[mask] = [f"km {value:,.0f} < km sebelumnya {prev:,.0f}" for value, prev in zip(km, previous)]
+        yield chunk, flags, pd.Series(detail, index=chunk.index, dtype=object)
+
+def check_data_integrity(vehicle_file, service_file, findings_file=None, max_findings=1000, chunksize=SERVICE_CHUNKSIZE):
+    """
+    Memeriksa integritas file servis per potongan (memori terbatas):
+    plat tanpa kendaraan, baris / id_servis duplikat, tanggal tidak valid,
+    dan km_saat_servis yang mundur dibanding servis sebelumnya
+    Parameter:
+        - vehicle_file (string): path file kendaraan
+        - service_file (string): path file servis
+        - findings_file (string): jika diisi, semua temuan ditulis ke CSV ini
+        - max_findings (int): jumlah temuan maksimal yang dikembalikan
+        - chunksize (int): jumlah baris per potongan
+    Return: Tuple (dict jumlah per masalah, DataFrame temuan)
+            kolom 'baris' = nomor baris data (0 = baris pertama setelah header)
+    """
+    summary = {'total_baris': 0}
+    summary.update({masalah: 0 for masalah in INTEGRITY_ISSUES})
+    findings = pd.DataFrame(columns=INTEGRITY_FINDING_COLUMNS)
+    try:
+        if findings_file and os.path.exists(findings_file):
+            os.remove(findings_file)
+        for chunk, flags, detail in _iter_integrity_flags(vehicle_file, service_file, chunksize):
+            summary['total_baris'] += len(chunk)
+            parts = []
+            for masalah in INTEGRITY_ISSUES:
+                mask = flags[masalah].to_numpy()
+                summary[masalah] += int(mask.sum())
+                if mask.any():
+                    parts.append(pd.DataFrame({
+                        'baris': chunk.index[mask],
+                        'id_servis': chunk['id_servis'].to_numpy()[mask],
+                        'plat_nomor': chunk['plat_nomor'].to_numpy()[mask],
+                        'masalah': masalah,
+                        'detail': detail.to_numpy()[mask]
+                    }))
+            if not parts:
+                continue
+            chunk_findings = pd.concat(parts, ignore_index=True).sort_values('baris', kind='stable')
+            if findings_file:
+                chunk_findings.to_csv(findings_file, mode='a', header=not os.path.exists(findings_file), index=False)
+            if len(findings) < max_findings:
+                findings = pd.concat([findings, chunk_findings], ignore_index=True).head(max_findings)
+        return summary, findings
+    except Exception as e:
+        print(f"Error checking data integrity: {e}")
+        return summary, findings
+
+# ===== FUNGSI 45: REPAIR SERVICE LOG =====
+def get_quarantine_path(service_file):
+    return os.path.splitext(service_file)[0] + '_karantina.csv'
+
+def repair_service_log(vehicle_file, service_file, masalah=None, chunksize=SERVICE_CHUNKSIZE):
+    """
+    Memperbaiki file servis secara streaming (ditulis ke file sementara lalu diganti):
+    baris dengan id_duplikat diberi id_servis baru, baris dengan masalah lain
+    yang dipilih dipindah ke file karantina <nama>_karantina.csv
+    Parameter:
+        - vehicle_file (string): path file kendaraan
+        - service_file (string): path file servis
+        - masalah (list): jenis masalah yang ditangani (None = semua)
+        - chunksize (int): jumlah baris per potongan
+    Return: Tuple (Boolean, pesan)
+    """
+    tmp_path = f"{service_file}.{os.getpid()}.tmp"
+    try:
+        if not os.path.exists(service_file):
+            return True, "File servis belum ada"
+        masalah = list(masalah or INTEGRITY_ISSUES)
+        quarantine_issues = [m for m in masalah if m != 'id_duplikat']
+        quarantine_file = get_quarantine_path(service_file)
+
+        # Kunci file servis selama baca-tulis ulang agar servis yang di-append proses lain tidak hilang
+        with file_lock(service_file):
+            # Nomor id tertinggi untuk membuat id_servis baru yang tidak bentrok
+            next_num = max(get_archived_id_max(service_file), _read_id_mark(get_service_id_mark_path(service_file)) or 0)
+            for chunk in iter_service_chunks(service_file, ['id_servis'], chunksize):
+                next_num = max(next_num, _max_service_id_number(chunk['id_servis']))
+
+            quarantined = []
+            renamed = []
+            first_chunk = True
+            for chunk, flags, _ in _iter_integrity_flags(vehicle_file, service_file, chunksize):
+                to_quarantine = flags[quarantine_issues].any(axis=1).to_numpy() if quarantine_issues else np.zeros(len(chunk), dtype=bool)
+                if 'id_duplikat' in masalah:
+                    to_rename = flags['id_duplikat'].to_numpy() & ~to_quarantine
+                    if to_rename.any():
+                        new_ids = [f'SRV{next_num + i + 1:03d}' for i in range(int(to_rename.sum()))]
+                        next_num += len(new_ids)
+                        renamed += list(zip(new_ids, chunk['id_servis'].to_numpy()[to_rename]))
+                        chunk = chunk.astype({'id_servis': object})
+                        chunk.loc[to_rename, 'id_servis'] = new_ids
+
+                if to_quarantine.any():
+                    df_bad = chunk[to_quarantine].assign(
+                        masalah=[', '.join(m for m in quarantine_issues if row[m]) for _, row in flags[to_quarantine].iterrows()]
+                    )
+                    df_bad.to_csv(quarantine_file, mode='a', header=not os.path.exists(quarantine_file), index=False)
+                    quarantined += df_bad['id_servis'].tolist()
+
+                chunk[~to_quarantine].to_csv(tmp_path, mode='w' if first_chunk else 'a', header=first_chunk, index=False)
+                first_chunk = False
+
+            if not quarantined and not renamed:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                return True, "Tidak ada baris yang perlu diperbaiki"
+
+            os.replace(tmp_path, service_file)
+            _write_id_mark(get_service_id_mark_path(service_file), next_num)
+
+            # File ditulis ulang: bangun ulang turunan (rollup, indeks offset) dan catat perubahan
+            build_rollups(service_file, chunksize)
+            build_vehicle_summary(service_file, chunksize)
+            if os.path.exists(get_service_index_path(service_file)):
+                build_service_index(service_file)
+            log_changes(service_file, 'hapus', 'servis', [(id_servis, {'karantina': quarantine_file}) for id_servis in quarantined])
+            log_changes(service_file, 'ubah', 'servis', [(new_id, {'id_servis_lama': old_id}) for new_id, old_id in renamed])
+
+        return True, f"{len(quarantined)} baris dikarantina, {len(renamed)} id_servis duplikat diganti"
+    except Exception as e:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        print(f"Error repairing service log: {e}")
+        return False, f"Error perbaikan: {str(e)}"
+
+def _job_check_integrity(params, progress):
+    progress(0.1, 'Memeriksa file servis...')
+    findings_file = f"data/integritas_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
+    summary, _ = check_data_integrity(params['vehicle_file'], params['service_file'], findings_file)
+    if not os.path.exists(findings_file):
+        return f"Tidak ada masalah pada {summary['total_baris']} baris servis"
+    return findings_file
+
+def _job_repair_service_log(params, progress):
+    progress(0.1, 'Memperbaiki file servis...')
+    success, message = repair_service_log(params['vehicle_file'], params['service_file'], params.get('masalah'))
+    if not success:
+        raise RuntimeError(message)
+    return message
+
+JOB_FUNCTIONS['cek_integritas'] = _job_check_integrity
+JOB_FUNCTIONS['perbaiki_integritas'] = _job_repair_service_log
+
+# ===== FUNGSI 46: BUILD VEHICLE SUMMARY =====
+# Statistik cukup (sufficient statistics) per plat: semua kolom bisa dijumlah /
+# di-min / di-max, sehingga ringkasan bisa digabung per potongan & diperbarui inkremental
+VEHICLE_SUMMARY_COLUMNS = [
+    'plat_nomor', 'jumlah_servis', 'total_biaya', 'km_awal', 'km_akhir',
+    'tanggal_awal', 'tanggal_akhir', 'sigma_hari', 'sigma_hari2', 'sigma_hari_biaya',
+    'servis_terakhir'
+]
+SUMMARY_EPOCH = pd.Timestamp('2000-01-01')
+SUMMARY_COMPACT_ROWS = 2000  # baris tambahan (append) sebelum file ringkasan dipadatkan
+
+# Cache ringkasan per proses: {path_ringkasan: (kunci_file, DataFrame)}
+_VEHICLE_SUMMARY_CACHE = {}
+
+def get_vehicle_summary_path(service_file):
+    return os.path.splitext(service_file)[0] + '_ringkasan_kendaraan.csv'
+
+def _aggregate_vehicle_summary(df_services):
+    # Satu groupby per plat + servis terakhir per (plat, jenis_servis) dalam format panjang
+    tanggal = pd.to_datetime(df_services['tanggal'], errors='coerce')
+    valid = tanggal.notna().to_numpy()
+    hari = ((tanggal - SUMMARY_EPOCH).dt.days).to_numpy(dtype=float)[valid]
+    biaya = pd.to_numeric(df_services['biaya'], errors='coerce').fillna(0).to_numpy(dtype=float)[valid]
+    base = pd.DataFrame({
+        'plat_nomor': df_services['plat_nomor'].astype(object).to_numpy()[valid],
+        'jenis_servis': df_services['jenis_servis'].astype(object).fillna('-').to_numpy()[valid],
+        'tanggal': tanggal.to_numpy()[valid],
+        'km': pd.to_numeric(df_services['km_saat_servis'], errors='coerce').to_numpy(dtype=float)[valid],
+        'biaya': biaya,
+        'hari': hari,
+        'hari2': hari * hari,
+        'hari_biaya': hari * biaya
+    })
+    summary = base.groupby('plat_nomor', as_index=False).agg(
+        jumlah_servis=('biaya', 'size'),
+        total_biaya=('biaya', 'sum'),
+        km_awal=('km', 'min'),
+        km_akhir=('km', 'max'),
+        tanggal_awal=('tanggal', 'min'),
+        tanggal_akhir=('tanggal', 'max'),
+        sigma_hari=('hari', 'sum'),
+        sigma_hari2=('hari2', 'sum'),
+        sigma_hari_biaya=('hari_biaya', 'sum')
+    )
+    last = base.groupby(['plat_nomor', 'jenis_servis'], as_index=False)['tanggal'].max()
+    return summary, last
+
+def _combine_vehicle_summary(parts):
+    # Gabungkan beberapa ringkasan parsial untuk plat yang sama
+    merged = pd.concat(parts, ignore_index=True)
+    return merged.groupby('plat_nomor', as_index=False).agg(
+        jumlah_servis=('jumlah_servis', 'sum'),
+        total_biaya=('total_biaya', 'sum'),
+        km_awal=('km_awal', 'min'),
+        km_akhir=('km_akhir', 'max'),
+        tanggal_awal=('tanggal_awal', 'min'),
+        tanggal_akhir=('tanggal_akhir', 'max'),
+        sigma_hari=('sigma_hari', 'sum'),
+        sigma_hari2=('sigma_hari2', 'sum'),
+        sigma_hari_biaya=('sigma_hari_biaya', 'sum')
+    )
+
+def _finalize_vehicle_summary(summary, last):
+    # Servis terakhir per jenis disimpan sebagai JSON {jenis_servis: tanggal}
+    last = last.groupby(['plat_nomor', 'jenis_servis'], as_index=False)['tanggal'].max()
+    last_json = {
+        plat: json.dumps(dict(zip(group['jenis_servis'], group['tanggal'].dt.strftime('%Y-%m-%d'))), ensure_ascii=False)
+        for plat, group in last.groupby('plat_nomor')
+    }
+    summary = summary.assign(
+        tanggal_awal=summary['tanggal_awal'].dt.strftime('%Y-%m-%d'),
+        tanggal_akhir=summary['tanggal_akhir'].dt.strftime('%Y-%m-%d'),
+        servis_terakhir=summary['plat_nomor'].map(last_json).fillna('{}')
+    )
+    return summary[VEHICLE_SUMMARY_COLUMNS]
+
+def _merge_vehicle_summary(raw):
+    # Gabungkan baris tambahan (hasil append) untuk plat yang muncul lebih dari sekali
+    duplicated = raw['plat_nomor'].duplicated(keep=False).to_numpy()
+    if not duplicated.any():
+        return raw
+    parts = raw[duplicated]
+    merged = _combine_vehicle_summary([parts.drop(columns='servis_terakhir').assign(
+        tanggal_awal=pd.to_datetime(parts['tanggal_awal']),
+        tanggal_akhir=pd.to_datetime(parts['tanggal_akhir'])
+    )])
+    merged = _finalize_vehicle_summary(merged, _summary_last_services(parts))
+    return pd.concat([raw[~duplicated], merged], ignore_index=True)[VEHICLE_SUMMARY_COLUMNS]
+
+def _read_vehicle_summary(summary_path):
+    # Seperti rollup: baris tambahan digabung saat dibaca dan file
+    # dipadatkan sesekali jika baris tambahannya sudah banyak
+    raw = pd.read_csv(summary_path, dtype={'plat_nomor': str, 'servis_terakhir': str})
+    df = _merge_vehicle_summary(raw)
+    if len(raw) - len(df) > SUMMARY_COMPACT_ROWS:
+        with file_lock(summary_path):
+            raw = pd.read_csv(summary_path, dtype={'plat_nomor': str, 'servis_terakhir': str})
+            df = _merge_vehicle_summary(raw)
+            tmp_path = f"{summary_path}.{os.getpid()}.tmp"
+            df.to_csv(tmp_path, index=False)
+            os.replace(tmp_path, summary_path)
+    return df.assign(
+        tanggal_awal=pd.to_datetime(df['tanggal_awal']),
+        tanggal_akhir=pd.to_datetime(df['tanggal_akhir'])
+    )
+
+def _summary_last_services(df_summary):
+    # Kebalikan _finalize_vehicle_summary: JSON -> format panjang
+    rows = [
+        (plat, jenis, tanggal)
+        for plat, data in zip(df_summary['plat_nomor'], df_summary['servis_terakhir'])
+        for jenis, tanggal in json.loads(data if isinstance(data, str) else '{}').items()
+    ]
+    last = pd.DataFrame(rows, columns=['plat_nomor', 'jenis_servis', 'tanggal'])
+    return last.assign(tanggal=pd.to_datetime(last['tanggal']))
+
+def build_vehicle_summary(service_file, chunksize=SERVICE_CHUNKSIZE):
+    """
+    Membangun tabel ringkasan biaya per kendaraan dalam satu pass grouped
+    (file aktif + arsip, dibaca per potongan)
+    Parameter:
+        - service_file (string): path file CSV servis
+        - chunksize (int): jumlah baris per potongan
+    Return: Boolean (True jika sukses)
+    """
+    try:
+        usecols = ['plat_nomor', 'tanggal', 'km_saat_servis', 'jenis_servis', 'biaya']
+        summary = None
+        last = None
+        for source in [service_file] + list_archive_segments(service_file):
+            if not os.path.exists(source):
+                continue
+            for chunk in pd.read_csv(source, usecols=usecols, chunksize=chunksize):
+                chunk_summary, chunk_last = _aggregate_vehicle_summary(chunk)
+                summary = chunk_summary if summary is None else _combine_vehicle_summary([summary, chunk_summary])
+                last = chunk_last if last is None else pd.concat([last, chunk_last], ignore_index=True).groupby(
+                    ['plat_nomor', 'jenis_servis'], as_index=False)['tanggal'].max()
+
+        if summary is None:
+            df_summary = pd.DataFrame(columns=VEHICLE_SUMMARY_COLUMNS)
+        else:
+            df_summary = _finalize_vehicle_summary(summary, last)
+        summary_path = get_vehicle_summary_path(service_file)
+        with file_lock(summary_path):
+            df_summary.to_csv(summary_path, index=False)
+        return True
+    except Exception as e:
+        print(f"Error building vehicle summary: {e}")
+        return False
+
+# ===== FUNGSI 47: UPDATE VEHICLE SUMMARY =====
+def update_vehicle_summary(service_file, df_new):
+    """
+    Memperbarui ringkasan hanya untuk plat pada servis yang baru ditambahkan:
+    ringkasan parsial plat tersebut di-append (tanpa menulis ulang file),
+    lalu digabung saat dibaca
+    Parameter:
+        - service_file (string): path file CSV servis
+        - df_new (DataFrame): baris servis baru
+    Return: Boolean (True jika sukses)
+    """
+    try:
+        summary_path = get_vehicle_summary_path(service_file)
+        with file_lock(summary_path):
+            if not os.path.exists(summary_path):
+                return build_vehicle_summary(service_file)
+
+            delta, delta_last = _aggregate_vehicle_summary(df_new)
+            if delta.empty:
+                os.utime(summary_path)
+                return True
+
+            _finalize_vehicle_summary(delta, delta_last).to_csv(summary_path, mode='a', header=False, index=False)
+        return True
+    except Exception as e:
+        print(f"Error updating vehicle summary: {e}")
+        return False
+
+def remove_from_vehicle_summary(service_file, plat_nomor):
+    # Dipanggil setelah kendaraan beserta seluruh riwayatnya dihapus
+    try:
+        summary_path = get_vehicle_summary_path(service_file)
+        if not os.path.exists(summary_path):
+            return True
+        with file_lock(summary_path):
+            df_summary = pd.read_csv(summary_path, dtype={'plat_nomor': str, 'servis_terakhir': str})
+            df_summary[df_summary['plat_nomor'] != plat_nomor].to_csv(summary_path, index=False)
+        return True
+    except Exception as e:
+        print(f"Error updating vehicle summary: {e}")
+        return False
+
+# ===== FUNGSI 48: GET VEHICLE SUMMARY =====
+def get_vehicle_summary(service_file, plat_nomor=None):
+    """
+    Membaca ringkasan biaya per kendaraan beserta metrik turunannya:
+    rata_rata_biaya, biaya_per_km, servis_per_tahun, tren_biaya_per_tahun
+    (kemiringan regresi biaya terhadap waktu, Rp per tahun)
+    Parameter:
+        - service_file (string): path file CSV servis
+        - plat_nomor (string): jika diisi, hanya baris plat ini
+    Return: DataFrame pandas
+    """
+    try:
+        summary_path = get_vehicle_summary_path(service_file)
+
+        # Bangun ulang jika ringkasan belum ada atau lebih lama dari file servis
+        stale = (
+            not os.path.exists(summary_path)
+            or (os.path.exists(service_file)
+                and os.path.getmtime(summary_path) < os.path.getmtime(service_file))
+        )
+        if stale:
+            build_vehicle_summary(service_file)
+
+        file_key = _file_key(summary_path)
+        cached = _VEHICLE_SUMMARY_CACHE.get(summary_path)
+        if cached is not None and cached[0] == file_key:
+            df = cached[1]
+        else:
+            df = _read_vehicle_summary(summary_path)
+            n = df['jumlah_servis'].astype(float)
+            span_years = (df['tanggal_akhir'] - df['tanggal_awal']).dt.days / 365.25
+            km_driven = df['km_akhir'] - df['km_awal']
+            denominator = n * df['sigma_hari2'] - df['sigma_hari'] ** 2
+            slope = (n * df['sigma_hari_biaya'] - df['sigma_hari'] * df['total_biaya']) / denominator.where(denominator > 0)
+            df = df.assign(
+                rata_rata_biaya=df['total_biaya'] / n,
+                biaya_per_km=df['total_biaya'] / km_driven.where(km_driven > 0),
+                servis_per_tahun=(n - 1) / span_years.where(span_years > 0),
+                tren_biaya_per_tahun=slope * 365.25
+            )
+            _VEHICLE_SUMMARY_CACHE[summary_path] = (file_key, df)
+
+        if plat_nomor is not None:
+            return df[df['plat_nomor'] == plat_nomor]
+        return df
+    except Exception as e:
+        print(f"Error reading vehicle summary: {e}")
+        return pd.DataFrame()
+
+# ===== FUNGSI 49: BUILD COST BASELINES =====
+# Baseline biaya wajar per (jenis_servis, jenis kendaraan, bengkel) memakai median/MAD;
+# kelompok kecil memakai baseline gabungan semua bengkel (bengkel = '*')
+ANOMALY_KEYS = ['jenis_servis', 'jenis', 'bengkel']
+ANOMALY_THRESHOLD = 3.5
+ANOMALY_MIN_SAMPLES = 5
+ANOMALY_MIN_SCALE = 0.05  # skala minimum = 5% median, agar kelompok berharga seragam tetap bisa diskor
+COST_BASELINE_COLUMNS = ANOMALY_KEYS + ['jumlah', 'median', 'mad', 'mean_ad']
+
+# Cache baseline per proses: {path_baseline: (kunci_file, DataFrame)}
+_COST_BASELINE_CACHE = {}
+
+def get_cost_baseline_path(service_file):
+    return os.path.splitext(service_file)[0] + '_baseline_biaya.csv'
+
+def _prepare_cost_rows(df_services, df_vehicles):
+    # Tambahkan jenis kendaraan dan isi kunci kosong agar bisa dikelompokkan
+    jenis_map = df_vehicles.drop_duplicates('plat_nomor').set_index('plat_nomor')['jenis'] if not df_vehicles.empty else pd.Series(dtype=object)
+    return df_services.assign(
+        jenis=df_services['plat_nomor'].map(jenis_map).astype(object).fillna('-'),
+        jenis_servis=df_services['jenis_servis'].astype(object).fillna('-'),
+        bengkel=df_services['bengkel'].astype(object).fillna('-'),
+        biaya=pd.to_numeric(df_services['biaya'], errors='coerce')
+    )
+
+def _load_cost_rows(vehicle_file, service_file, chunksize=SERVICE_CHUNKSIZE):
+    # Hanya kolom yang dibutuhkan untuk skor biaya
+    usecols = ['id_servis', 'plat_nomor', 'tanggal', 'jenis_servis', 'bengkel', 'biaya']
+    chunks = list(iter_service_chunks(service_file, usecols, chunksize))
+    df_services = pd.concat(chunks, ignore_index=True) if chunks else pd.DataFrame(columns=usecols)
+    return _prepare_cost_rows(df_services, load_data(vehicle_file))
+
+def _robust_baseline(df_costs, keys):
+    # Median & MAD per kelompok dalam satu pass groupby
+    df_costs = df_costs.dropna(subset=['biaya'])
+    median = df_costs.groupby(keys)['biaya'].transform('median')
+    base = df_costs[keys].assign(biaya=df_costs['biaya'], deviasi=(df_costs['biaya'] - median).abs())
+    return base.groupby(keys, as_index=False).agg(
+        jumlah=('biaya', 'size'),
+        median=('biaya', 'median'),
+        mad=('deviasi', 'median'),
+        mean_ad=('deviasi', 'mean')
+    )
+
+def build_cost_baselines(vehicle_file, service_file, df_costs=None):
+    """
+    Menghitung baseline biaya (median/MAD) per jenis servis, jenis kendaraan
+    dan bengkel, lalu menyimpannya sebagai cache untuk skor servis baru
+    Parameter:
+        - vehicle_file (string): path file kendaraan
+        - service_file (string): path file servis
+        - df_costs (DataFrame): baris biaya yang sudah disiapkan (opsional)
+    Return: DataFrame baseline
+    """
+    try:
+        if df_costs is None:
+            df_costs = _load_cost_rows(vehicle_file, service_file)
+        specific = _robust_baseline(df_costs, ANOMALY_KEYS)
+        pooled = _robust_baseline(df_costs, ['jenis_servis', 'jenis']).assign(bengkel='*')
+        baselines = pd.concat([specific, pooled], ignore_index=True)[COST_BASELINE_COLUMNS]
+
+        baseline_path = get_cost_baseline_path(service_file)
+        baselines.to_csv(baseline_path, index=False)
+        _COST_BASELINE_CACHE[baseline_path] = (_file_key(baseline_path), baselines)
+        return baselines
+    except Exception as e:
+        print(f"Error building cost baselines: {e}")
+        return pd.DataFrame(columns=COST_BASELINE_COLUMNS)
+
+def _get_cost_baselines(vehicle_file, service_file):
+    # Baseline tidak perlu segar setiap saat (median stabil), cukup dibangun jika belum ada
+    baseline_path = get_cost_baseline_path(service_file)
+    if not os.path.exists(baseline_path):
+        return build_cost_baselines(vehicle_file, service_file)
+    file_key = _file_key(baseline_path)
+    cached = _COST_BASELINE_CACHE.get(baseline_path)
+    if cached is None or cached[0] != file_key:
+        baselines = pd.read_csv(baseline_path, dtype={key: str for key in ANOMALY_KEYS})
+        cached = (file_key, baselines)
+        _COST_BASELINE_CACHE[baseline_path] = cached
+    return cached[1]
+
+def _score_costs(df_costs, baselines):
+    # Modified z-score: 0.6745 * (x - median) / MAD; jika MAD = 0 pakai
+    # mean absolute deviation (x 1.2533), dan skala tidak boleh di bawah
+    # ANOMALY_MIN_SCALE x median (harga identik membuat keduanya 0)
+    specific = baselines[baselines['bengkel'] != '*']
+    pooled = baselines[baselines['bengkel'] == '*'].drop(columns='bengkel')
+    scored = df_costs.merge(specific, on=ANOMALY_KEYS, how='left').merge(
+        pooled, on=['jenis_servis', 'jenis'], how='left', suffixes=('', '_gabungan')
+    )
+    use_specific = scored['jumlah'].fillna(0) >= ANOMALY_MIN_SAMPLES
+    for column in ['jumlah', 'median', 'mad', 'mean_ad']:
+        scored[column] = scored[column].where(use_specific, scored[f'{column}_gabungan'])
+    scored = scored.drop(columns=[f'{column}_gabungan' for column in ['jumlah', 'median', 'mad', 'mean_ad']])
+
+    scale = (scored['mad'] / 0.6745).where(scored['mad'] > 0, scored['mean_ad'] * 1.2533)
+    scale = np.maximum(scale, ANOMALY_MIN_SCALE * scored['median'])
+    enough = scored['jumlah'].fillna(0) >= ANOMALY_MIN_SAMPLES
+    scored['skor'] = ((scored['biaya'] - scored['median']) / scale.where(scale > 0)).where(enough)
+    scored['kelipatan'] = scored['biaya'] / scored['median'].where(scored['median'] > 0)
+    return scored.rename(columns={'median': 'median_biaya'})
+
+# ===== FUNGSI 50: DETECT COST ANOMALIES =====
+def detect_cost_anomalies(vehicle_file, service_file, threshold=ANOMALY_THRESHOLD, top_n=50):
+    """
+    Memindai seluruh log servis dan mengembalikan biaya yang paling tidak wajar
+    (baseline dihitung ulang dan disimpan sebagai cache)
+    Parameter:
+        - vehicle_file (string): path file kendaraan
+        - service_file (string): path file servis
+        - threshold (float): batas |skor| untuk dianggap anomali
+        - top_n (int): jumlah anomali teratas yang dikembalikan
+    Return: DataFrame pandas (diurutkan dari |skor| terbesar)
+    """
+    try:
+        df_costs = _load_cost_rows(vehicle_file, service_file)
+        if df_costs.empty:
+            return pd.DataFrame()
+        baselines = build_cost_baselines(vehicle_file, service_file, df_costs)
+        scored = _score_costs(df_costs, baselines)
+        outliers = scored[scored['skor'].abs() >= threshold]
+        outliers = outliers.assign(skor_mutlak=outliers['skor'].abs()).nlargest(top_n, 'skor_mutlak')
+        return outliers[[
+            'id_servis', 'plat_nomor', 'tanggal', 'jenis_servis', 'jenis', 'bengkel',
+            'biaya', 'median_biaya', 'kelipatan', 'skor'
+        ]].reset_index(drop=True)
+    except Exception as e:
+        print(f"Error detecting cost anomalies: {e}")
+        return pd.DataFrame()
+
+# ===== FUNGSI 51: SCORE SERVICE COST =====
+def score_service_cost(vehicle_file, service_file, service_data, threshold=ANOMALY_THRESHOLD):
+    """
+    Memberi skor biaya satu servis baru terhadap baseline yang sudah di-cache
+    (tanpa memindai ulang riwayat)
+    Parameter:
+        - vehicle_file (string): path file kendaraan
+        - service_file (string): path file servis
+        - service_data (dict): data servis yang baru disimpan
+        - threshold (float): batas |skor| untuk dianggap anomali
+    Return: Dictionary {'anomali', 'skor', 'median_biaya', 'kelipatan'} atau None
+    """
+    # Kasus satu servis dari skor massal
+    return score_service_costs(vehicle_file, service_file, [service_data], threshold)[0]
+
+def score_service_costs(vehicle_file, service_file, services, threshold=ANOMALY_THRESHOLD):
+    """
+    Memberi skor biaya banyak servis sekaligus: kendaraan dibaca sekali dan
+    semua baris dicocokkan ke baseline dalam satu kali merge
+    Parameter:
+        - vehicle_file (string): path file kendaraan
+        - service_file (string): path file servis
+        - services (list): daftar dict data servis
+        - threshold (float): batas |skor| untuk dianggap anomali
+    Return: List (Dictionary hasil skor atau None per servis, urutan sama)
+    """
+    try:
+        if not services:
+            return []
+        df_new = _prepare_cost_rows(pd.DataFrame(services), load_data(vehicle_file))
+        scored = _score_costs(df_new, _get_cost_baselines(vehicle_file, service_file))
+        return [
+            None if pd.isna(row['skor']) else {
+                'anomali': bool(abs(row['skor']) >= threshold),
+                'skor': float(row['skor']),
+                'median_biaya': float(row['median_biaya']),
+                'kelipatan': float(row['kelipatan']) if pd.notna(row['kelipatan']) else None
+            }
+            for row in scored[['skor', 'median_biaya', 'kelipatan']].to_dict('records')
+        ]
+    except Exception as e:
+        print(f"Error scoring service cost: {e}")
+        return [None] * len(services)
+
+# ===== FUNGSI 52: LOOKUP VEHICLES BATCH =====
+def lookup_vehicles_batch(vehicle_file, service_file, plates, n_services=5):
+    """
+    Mengambil data kendaraan, ringkasan biaya dan servis terakhir untuk banyak
+    plat sekaligus (dipakai api.py untuk scanner gerbang)
+    Parameter:
+        - vehicle_file (string): path file kendaraan
+        - service_file (string): path file servis
+        - plates (list): daftar plat nomor
+        - n_services (int): jumlah servis terakhir per plat
+    Return: Dictionary {plat_nomor: {'kendaraan', 'ringkasan', 'servis_terakhir', 'saran'}}
+    """
+    result = {}
+    try:
+        plates = [str(plat) for plat in plates]
+        df_vehicles = load_data(vehicle_file)
+        df_found = df_vehicles[df_vehicles['plat_nomor'].isin(plates)] if not df_vehicles.empty else df_vehicles
+        vehicles = {row['plat_nomor']: row for row in json.loads(df_found.to_json(orient='records', force_ascii=False))}
+
+        # Servis semua plat yang ditemukan dibaca dalam satu kali parse lewat indeks offset
+        found = list(vehicles.keys())
+        df_services = read_plate_services(service_file, found) if found and os.path.exists(service_file) else None
+        if df_services is None:
+            df_services = pd.DataFrame(columns=['plat_nomor', 'tanggal'])
+        df_services = df_services.sort_values('tanggal', ascending=False).groupby('plat_nomor').head(n_services)
+        services = {
+            plat: json.loads(group.to_json(orient='records', force_ascii=False))
+            for plat, group in df_services.groupby('plat_nomor')
+        }
+
+        df_summary = get_vehicle_summary(service_file)
+        df_summary = df_summary[df_summary['plat_nomor'].isin(found)] if not df_summary.empty else df_summary
+        summaries = {}
+        if not df_summary.empty:
+            df_summary = df_summary.drop(columns=['sigma_hari', 'sigma_hari2', 'sigma_hari_biaya']).assign(
+                tanggal_awal=df_summary['tanggal_awal'].dt.strftime('%Y-%m-%d'),
+                tanggal_akhir=df_summary['tanggal_akhir'].dt.strftime('%Y-%m-%d')
+            )
+            for row in json.loads(df_summary.to_json(orient='records', force_ascii=False)):
+                row['servis_terakhir'] = json.loads(row['servis_terakhir'] or '{}')
+                summaries[row['plat_nomor']] = row
+
+        for plat in plates:
+            result[plat] = {
+                'kendaraan': vehicles.get(plat),
+                'ringkasan': summaries.get(plat),
+                'servis_terakhir': services.get(plat, []),
+                'saran': [] if plat in vehicles else suggest_plates(vehicle_file, plat)
+            }
+        return result
+    except Exception as e:
+        print(f"Error looking up vehicles: {e}")
+        return result